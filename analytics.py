@@ -0,0 +1,114 @@
+"""Sales summaries kept in step with orders.
+
+The order handlers call record_order / record_status_change inside their own
+transaction, which upsert additive deltas into three small tables:
+
+    order_status_totals     orders, units and revenue per status
+    product_sales           per product, excluding cancelled orders
+    category_daily_sales    per (UTC day, category), excluding cancelled orders
+
+so the /analytics endpoints read one row per group. Orders written outside
+the API (seed.py, manual SQL) aren't counted until a rebuild:
+
+    python analytics.py --rebuild
+"""
+import argparse
+import time
+from sqlalchemy import delete, func, insert, select, update
+from database import engine, dialect_insert
+from models import Order, Product, OrderStatusTotal, ProductSales, CategoryDailySales
+
+# Orders in these statuses stay in the status breakdown but earn no revenue
+NON_REVENUE_STATUSES = {"Cancelled"}
+
+def counts_as_sale(status: str) -> bool:
+    return status not in NON_REVENUE_STATUSES
+
+def add_totals(model, keys: dict, orders: int, units: int, revenue: float):
+    """Upsert that adds to the row's totals, creating it if missing."""
+    table = model.__table__
+    stmt = dialect_insert(table).values(**keys, orders=orders, units=units, revenue=revenue)
+    return stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + stmt.excluded[name] for name in ("orders", "units", "revenue")},
+    )
+
+def order_revenue(order: Order) -> float:
+    return order.quantity * (order.unit_price or 0)
+
+async def record_sale(db, order: Order, sign: int, category_id=None):
+    if category_id is None:
+        category_id = await db.scalar(select(Product.category_id).where(Product.id == order.product_id))
+    orders, units, revenue = sign, sign * order.quantity, sign * order_revenue(order)
+    await db.execute(add_totals(ProductSales, {"product_id": order.product_id}, orders, units, revenue))
+    # Legacy orders without a timestamp, or whose product is gone, have no day/category
+    if order.created_at is not None and category_id is not None:
+        keys = {"day": order.created_at.date(), "category_id": category_id}
+        await db.execute(add_totals(CategoryDailySales, keys, orders, units, revenue))
+
+async def record_order(db, order: Order, sign: int = 1, category_id=None):
+    """Count a new order (sign=1) or take a deleted one back out (sign=-1)."""
+    keys = {"status": order.status}
+    await db.execute(add_totals(OrderStatusTotal, keys, sign, sign * order.quantity, sign * order_revenue(order)))
+    if counts_as_sale(order.status):
+        await record_sale(db, order, sign, category_id)
+
+async def record_status_change(db, order: Order, old_status: str):
+    """Move an order whose status has just been set from old_status."""
+    if order.status == old_status:
+        return
+    units, revenue = order.quantity, order_revenue(order)
+    await db.execute(add_totals(OrderStatusTotal, {"status": old_status}, -1, -units, -revenue))
+    await db.execute(add_totals(OrderStatusTotal, {"status": order.status}, 1, units, revenue))
+    if counts_as_sale(old_status) != counts_as_sale(order.status):
+        await record_sale(db, order, 1 if counts_as_sale(order.status) else -1)
+
+
+def rebuild(conn):
+    """Recompute every summary table from orders (sync connection, one transaction)."""
+    # Backfill price snapshots with the current price for orders placed before they existed
+    current_price = select(Product.price).where(Product.id == Order.product_id).scalar_subquery()
+    conn.execute(update(Order).where(Order.unit_price.is_(None)).values(unit_price=current_price))
+
+    for model in (OrderStatusTotal, ProductSales, CategoryDailySales):
+        conn.execute(delete(model))
+
+    totals = (
+        func.count(),
+        func.sum(Order.quantity),
+        func.coalesce(func.sum(Order.quantity * Order.unit_price), 0),
+    )
+    columns = ["orders", "units", "revenue"]
+    sales = Order.status.not_in(NON_REVENUE_STATUSES)
+
+    conn.execute(insert(OrderStatusTotal).from_select(
+        ["status", *columns],
+        select(Order.status, *totals).where(Order.status.is_not(None)).group_by(Order.status),
+    ))
+    conn.execute(insert(ProductSales).from_select(
+        ["product_id", *columns],
+        select(Order.product_id, *totals).where(sales).group_by(Order.product_id),
+    ))
+    day = func.date(Order.created_at)
+    conn.execute(insert(CategoryDailySales).from_select(
+        ["day", "category_id", *columns],
+        select(day, Product.category_id, *totals)
+        .join(Product, Product.id == Order.product_id)
+        .where(sales, Order.created_at.is_not(None))
+        .group_by(day, Product.category_id),
+    ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the sales summary tables.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute all summaries from orders")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do; pass --rebuild")
+    from migrations import migrate  # migrations imports this module
+    started = time.perf_counter()
+    migrate()
+    with engine.begin() as conn:
+        rebuild(conn)
+        groups = conn.scalar(select(func.count()).select_from(CategoryDailySales))
+    print(f"Rebuilt sales summaries in {time.perf_counter() - started:.1f}s ({groups} category-days)")
@@ -1,9 +1,103 @@
-from passlib.context import CryptContext
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from fastapi import HTTPException
+from config import BCRYPT_ROUNDS, HASH_POOL, HASH_WORKERS, HASH_MAX_PENDING
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Built on first use rather than at import: passlib is slow to import and
+# probes the bcrypt backend the first time it hashes. Process-pool workers
+# each build their own.
+@lru_cache(maxsize=None)
+def crypt_context():
+    from passlib.context import CryptContext
+    # min_rounds makes needs_update() flag hashes made with a lower cost, so
+    # raising BCRYPT_ROUNDS upgrades existing users as they log in
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+    )
 
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return crypt_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    return crypt_context().verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    # (valid, new_hash); new_hash is None unless the stored hash is outdated
+    return crypt_context().verify_and_update(plain_password, hashed_password)
+
+def warm_up_hashing():
+    # Loads passlib and the bcrypt backend in a pool worker
+    crypt_context().identify(hash_password("warm-up"))
+
+
+class HashPool:
+    """Runs bcrypt on its own executor, away from the request threadpool.
+
+    ``max_pending`` caps queued + running jobs; beyond it callers get a 503
+    straight away instead of piling up behind a login burst.
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many authentication requests, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+hash_pool = HashPool(HASH_POOL, HASH_WORKERS, HASH_MAX_PENDING)
+
+async def hash_password_async(password: str):
+    return await hash_pool.run(hash_password, password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    return await hash_pool.run(verify_and_update, plain_password, hashed_password)
+
+async def warm_up_hash_pool():
+    # One job per worker so every thread/process has loaded the backend
+    await asyncio.gather(*(hash_pool.run(warm_up_hashing) for _ in range(hash_pool.workers)))
@@ -0,0 +1,107 @@
+"""Write latency on the primary under browse traffic, with and without a replica.
+
+    python benchmarks/bench_replica.py [--browsers 32] [--duration 10]
+
+Seeds one SQLite database, then for each mode starts a fresh interpreter
+in which --browsers clients read uncached listings while one admin client
+updates products back to back. "primary" sends every query to the one
+engine; "replica" sets READ_DATABASE_URL to a read-only connection to the
+same file, so GETs use their own pool. Reports the writer's latency
+percentiles and the browsers' throughput.
+
+Needs httpx from requirements-dev.txt.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+CHILD = """
+import asyncio, json, random, sys, time
+import httpx
+import main
+
+BROWSERS, DURATION, PRODUCTS = int(sys.argv[1]), float(sys.argv[2]), int(sys.argv[3])
+
+async def browse(client, rng, stop, counts):
+    while time.perf_counter() < stop:
+        if rng.random() < 0.5:
+            await client.get("/orders", params={"limit": 50, "product_id": rng.randint(1, PRODUCTS)})
+        else:
+            await client.get("/products", params={"limit": 50, "min_price": rng.randint(1, 1000), "sort": "price"})
+        counts[0] += 1
+
+async def write(client, headers, rng, stop, latencies):
+    while time.perf_counter() < stop:
+        started = time.perf_counter()
+        response = await client.patch(
+            f"/products/{rng.randint(1, PRODUCTS)}", json={"price": rng.randint(1, 1000)}, headers=headers,
+        )
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as writer, \\
+                httpx.AsyncClient(transport=transport, base_url="http://bench") as browser:
+            login = await writer.post("/login", json={"username": "admin@123", "password": "admin123"})
+            headers = {"Authorization": "Bearer " + login.json()["access_token"]}
+            rng, counts, latencies = random.Random(1), [0], []
+            stop = time.perf_counter() + DURATION
+            await asyncio.gather(
+                write(writer, headers, rng, stop, latencies),
+                *(browse(browser, random.Random(i), stop, counts) for i in range(BROWSERS)),
+            )
+    latencies.sort()
+    pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+    print(json.dumps({"writes": len(latencies), "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+                      "browse_rps": round(counts[0] / DURATION, 1)}))
+
+asyncio.run(run())
+"""
+
+
+def run_mode(mode, database, args) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{database}",
+        # Every listing misses the cache, as with many distinct filters
+        CACHE_TTL_SECONDS="0",
+        RATE_LIMIT_ENABLED="false",
+        DB_POOL_SIZE=str(args.pool_size),
+        DB_MAX_OVERFLOW="0",
+    )
+    env.pop("READ_DATABASE_URL", None)
+    if mode == "replica":
+        env["READ_DATABASE_URL"] = f"sqlite:///file:{database}?mode=ro&uri=true"
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, str(args.browsers), str(args.duration), str(args.products)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--browsers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+    database = os.path.join(tempfile.mkdtemp(prefix="bench-replica-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    import seed
+    seed.main(["--reset", "--synthetic", "--products", str(args.products), "--orders", str(args.orders)])
+    for mode in ("primary", "replica"):
+        result = run_mode(mode, database, args)
+        print(
+            f"{mode:<8} writes {result['writes']:5d}  p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms"
+            f"  p99 {result['p99_ms']:7.2f} ms  browse {result['browse_rps']:7.1f} req/s"
+        )
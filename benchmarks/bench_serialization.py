@@ -0,0 +1,93 @@
+"""CPU cost of rendering a 10k-row product list, per serialization path.
+
+    python benchmarks/bench_serialization.py [--rows 10000] [--repeat 20]
+
+Paths compared:
+  fastapi   ORM objects -> response_model validation -> jsonable dict -> json.dumps
+            (what a plain ``return db.query(...).all()`` handler costs)
+  pydantic  ORM objects -> TypeAdapter validate + dump_json (the default path)
+  fast      column rows -> orjson (FAST_JSON=1)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from database import Base
+from models import Category, Product
+from schemas import ProductOut
+from serialization import dump_rows, orjson
+
+
+def setup(rows: int):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Category), [{"id": 1, "name": "Bench"}])
+        conn.execute(insert(Product), [
+            {
+                "title": f"Product {i}",
+                "price": i * 1.25,
+                "description": f"Description of product number {i}, long enough to look real.",
+                "image": f"https://example.com/images/{i}.jpg",
+                "category_id": 1,
+                "stock": i % 100,
+            }
+            for i in range(rows)
+        ])
+    return engine
+
+def run(label, fn, repeat):
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        size = len(fn())
+        samples.append(time.process_time() - started)
+    samples.sort()
+    median = samples[len(samples) // 2] * 1000
+    print(f"{label:<10} {median:9.1f} ms CPU/request   {size / 1024:8.0f} KiB")
+    return median
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = setup(args.rows)
+    adapter = TypeAdapter(list[ProductOut])
+    columns = [Product.__table__.c[name] for name in ProductOut.model_fields]
+
+    def fastapi_path():
+        with Session(engine) as db:
+            products = db.scalars(select(Product)).all()
+            validated = adapter.validate_python(products, from_attributes=True)
+            return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+    def pydantic_path():
+        with Session(engine) as db:
+            products = db.scalars(select(Product)).all()
+            return adapter.dump_json(adapter.validate_python(products, from_attributes=True))
+
+    def fast_path():
+        with engine.connect() as conn:
+            return dump_rows(conn.execute(select(*columns)).all())
+
+    print(f"{args.rows} products, median of {args.repeat} runs, orjson {'on' if orjson else 'missing'}")
+    baseline = run("fastapi", fastapi_path, args.repeat)
+    for label, fn in (("pydantic", pydantic_path), ("fast", fast_path)):
+        cost = run(label, fn, args.repeat)
+        print(f"{'':<10} saves {baseline - cost:.1f} ms ({(1 - cost / baseline) * 100:.0f}%) vs fastapi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Cold-start timing: process start to first successful response.
+
+    python benchmarks/bench_startup.py                 # against ./ecommerce.db (copied, not modified)
+    python benchmarks/bench_startup.py --runs 10 --path /products?limit=50
+
+Each run starts a fresh interpreter on a copy of the database and reports
+how long importing main, running the lifespan startup and serving the
+first request took, plus the same end to end through uvicorn.
+
+Needs httpx from requirements-dev.txt.
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import httpx
+baseline = time.perf_counter() - started
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.get(sys.argv[1])
+            response.raise_for_status()
+        done = time.perf_counter()
+    return ready, done
+
+ready, done = asyncio.run(run())
+print(json.dumps({
+    "import": imported - started - baseline,
+    "startup": ready - imported,
+    "first_request": done - ready,
+    "total": done - started - baseline,
+}))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def fresh_env(workdir: str, source_db: str) -> dict:
+    database = os.path.join(workdir, "bench.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(database + suffix):
+            os.remove(database + suffix)
+    shutil.copy(source_db, database)
+    return {**os.environ, "DATABASE_URL": f"sqlite:///{database}", "RATE_LIMIT_ENABLED": "false"}
+
+def prepare(env: dict):
+    # Bring the copy's schema up to date outside the timed runs (before the
+    # migrator existed, importing main did it)
+    if os.path.exists(os.path.join(ROOT, "migrations.py")):
+        command = [sys.executable, "migrations.py"]
+    else:
+        command = [sys.executable, "-c", "import main"]
+    subprocess.run(command, cwd=ROOT, env=env, check=True, capture_output=True)
+
+def in_process(env: dict, path: str) -> dict:
+    import json
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD, path], cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def uvicorn(env: dict, path: str) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                if server.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/products")
+    parser.add_argument("--database", default=os.path.join(ROOT, "ecommerce.db"))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    samples = {"import": [], "startup": [], "first_request": [], "total": [], "uvicorn": []}
+    for _ in range(args.runs):
+        env = fresh_env(workdir, args.database)
+        prepare(env)
+        for key, value in in_process(env, args.path).items():
+            samples[key].append(value)
+        env = fresh_env(workdir, args.database)
+        prepare(env)
+        samples["uvicorn"].append(uvicorn(env, args.path))
+
+    print(f"median of {args.runs} runs, GET {args.path}")
+    for key, values in samples.items():
+        print(f"  {key:<14} {statistics.median(values) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
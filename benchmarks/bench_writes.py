@@ -0,0 +1,82 @@
+"""Write-path benchmark: ORM load/mutate/refresh vs single-statement RETURNING.
+
+    python benchmarks/bench_writes.py [--ops 1000]
+
+Runs each variant against a fresh, seeded SQLite database through the async
+engine, one session per operation as in a request, and reports operations
+per second and SQL statements per operation.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+async def orm_update(db, Product, product_id, price):
+    product = await db.get(Product, product_id)
+    product.price = price
+    await db.commit()
+    await db.refresh(product)
+
+async def returning_update(db, Product, product_id, price):
+    from writes import update_row
+    await update_row(db, Product, product_id, {"price": price})
+    await db.commit()
+
+async def orm_delete(db, Product, product_id, price):
+    product = await db.get(Product, product_id)
+    await db.delete(product)
+    await db.commit()
+
+async def returning_delete(db, Product, product_id, price):
+    from writes import delete_row
+    await delete_row(db, Product, product_id)
+    await db.commit()
+
+
+async def run(variant, ids, statements):
+    from database import AsyncSessionLocal
+    from models import Product
+    before = statements[0]
+    started = time.perf_counter()
+    for i, product_id in enumerate(ids):
+        async with AsyncSessionLocal() as db:
+            await variant(db, Product, product_id, 10 + i % 100)
+    elapsed = time.perf_counter() - started
+    return len(ids) / elapsed, (statements[0] - before) / len(ids)
+
+async def main(args):
+    from sqlalchemy import event
+    from database import async_engine
+    statements = [0]
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    ids = list(range(1, args.ops + 1))
+    delete_ids = list(range(args.ops + 1, 2 * args.ops + 1))
+    results = [
+        ("update  ORM get + commit + refresh", await run(orm_update, ids, statements)),
+        ("update  UPDATE ... RETURNING", await run(returning_update, ids, statements)),
+        ("delete  ORM get + delete", await run(orm_delete, delete_ids[::2], statements)),
+        ("delete  DELETE ... RETURNING", await run(returning_delete, delete_ids[1::2], statements)),
+    ]
+    await async_engine.dispose()
+    for name, (rate, per_op) in results:
+        print(f"{name:<36} {rate:8.0f} ops/s  {per_op:4.1f} statements/op")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=1000)
+    args = parser.parse_args()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-writes-')}/bench.db"
+    import seed
+    seed.main(["--no-demo", "--synthetic", "--products", str(3 * args.ops), "--users", "0", "--orders", "0"])
+    asyncio.run(main(args))
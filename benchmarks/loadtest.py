@@ -0,0 +1,263 @@
+"""Reproducible load test for the main endpoint groups.
+
+Needs the dev requirements (httpx): pip install -r requirements-dev.txt
+
+Seeds a fresh SQLite database with synthetic data, then drives each
+scenario with concurrent clients and reports latency percentiles and
+throughput:
+
+    python benchmarks/loadtest.py                         # in-process (httpx ASGI transport)
+    python benchmarks/loadtest.py --server --workers 2    # against a local uvicorn
+    python benchmarks/loadtest.py --output run.json
+    python benchmarks/loadtest.py --baseline run.json --max-regression 0.15
+
+Scenarios: catalog (listings, filters, detail, search), login, order
+(single-line checkout) and admin (category + product create/update/delete).
+With --baseline, exits non-zero if any scenario's p95 grew or its
+throughput fell by more than --max-regression.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+SCENARIOS = ("catalog", "login", "order", "admin")
+ADMIN = {"username": "admin@123", "password": "admin123"}
+
+
+# -------- SCENARIOS --------
+# Each one performs a single logical operation and returns the final status
+async def catalog(client, rng, ctx):
+    choice = rng.random()
+    if choice < 0.4:
+        response = await client.get("/products", params={"limit": 50, "category_id": rng.choice(ctx["categories"])})
+    elif choice < 0.6:
+        response = await client.get("/products", params={"limit": 50, "sort": "price", "min_price": rng.randint(1, 1000)})
+    elif choice < 0.8:
+        response = await client.get(f"/products/{rng.randint(1, ctx['products'])}", params={"expand": "category,offer"})
+    elif choice < 0.9:
+        response = await client.get("/products/search", params={"q": f"product {rng.randint(1, ctx['products'])}"})
+    else:
+        response = await client.get("/categories")
+    return response.status_code
+
+async def login(client, rng, ctx):
+    username = f"loadtest{rng.randrange(ctx['users']):06d}"
+    response = await client.post("/login", json={"username": username, "password": username})
+    return response.status_code
+
+async def order(client, rng, ctx):
+    username = f"loadtest{rng.randrange(ctx['users']):06d}"
+    response = await client.post("/orders", json={
+        "product_id": rng.randint(1, ctx["products"]),
+        "quantity": 1,
+        "user": username,
+        "status": "Pending",
+    })
+    # Out of stock is a valid checkout outcome, not a failure
+    return 200 if response.status_code == 409 else response.status_code
+
+async def admin(client, rng, ctx):
+    name = f"Bench category {rng.getrandbits(48):012x}"
+    headers = ctx["admin_headers"]
+    response = await client.post("/categories", json={"name": name}, headers=headers)
+    if response.status_code != 200:
+        return response.status_code
+    category_id = response.json()["id"]
+    product = {"title": name, "price": rng.randint(1, 500), "category_id": category_id}
+    response = await client.post("/products", json=product, headers=headers)
+    if response.status_code != 200:
+        return response.status_code
+    product_id = response.json()["id"]
+    await client.put(f"/products/{product_id}", json={**product, "price": product["price"] + 1}, headers=headers)
+    await client.delete(f"/products/{product_id}", headers=headers)
+    response = await client.delete(f"/categories/{category_id}", headers=headers)
+    return response.status_code
+
+
+# -------- RUNNER --------
+def percentile(samples: list, pct: float) -> float:
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, round(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+async def run_scenario(name, client, ctx, args):
+    scenario = globals()[name]
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(worker_id):
+        nonlocal errors
+        rng = random.Random(f"{args.seed}-{name}-{worker_id}")
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await scenario(client, rng, ctx)
+            except httpx.HTTPError:
+                status = 599
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def run_all(client, ctx, args) -> dict:
+    # The admin scenario authenticates as the demo admin seeded below
+    response = await client.post("/login", json=ADMIN)
+    response.raise_for_status()
+    ctx["admin_headers"] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    results = {}
+    for name in args.scenarios:
+        results[name] = await run_scenario(name, client, ctx, args)
+        r = results[name]
+        print(
+            f"{name:<8} {r['requests']:>7} req  {r['rps']:>8.1f} req/s  "
+            f"p50 {r['p50_ms']:>7.2f} ms  p95 {r['p95_ms']:>7.2f} ms  p99 {r['p99_ms']:>7.2f} ms  "
+            f"errors {r['errors']}"
+        )
+    return results
+
+async def run_in_process(ctx, args) -> dict:
+    import main
+    transport = httpx.ASGITransport(app=main.app)
+    # ASGITransport doesn't send lifespan events, so run the app's lifespan here
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            return await run_all(client, ctx, args)
+
+async def run_against_server(ctx, args, env) -> dict:
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+        "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+            for _ in range(100):
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            return await run_all(client, ctx, args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+# -------- COMPARISON --------
+def regressions(results: dict, baseline: dict, threshold: float) -> list:
+    found = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            found.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if previous["rps"] and current["rps"] < previous["rps"] * (1 - threshold):
+            found.append(f"{name}: throughput {previous['rps']} -> {current['rps']} req/s")
+    return found
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario")
+    parser.add_argument("--server", action="store_true", help="run against a local uvicorn instead of in-process")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers with --server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--database", help="SQLite file to use (default: a fresh temporary one)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.1, help="allowed fractional regression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    database = args.database or os.path.join(workdir, "loadtest.db")
+    # Must be set before anything imports config/database
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    # Measure the app, not the limiter: one client address sends everything here
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    import seed
+    seed.main([
+        "--reset", "--synthetic", "--seed", str(args.seed),
+        "--categories", str(args.categories), "--products", str(args.products),
+        "--users", str(args.users), "--orders", str(args.orders),
+    ])
+    ctx = {"products": args.products, "users": args.users, "categories": list(range(1, args.categories + 1))}
+
+    if args.server:
+        env = dict(os.environ)
+        # Workers share cache versions and rate limits through files beside the database
+        env["WEB_CONCURRENCY"] = str(args.workers)
+        env.setdefault("CACHE_BUS_SQLITE_PATH", os.path.join(workdir, "cache_bus.db"))
+        env.setdefault("RATE_LIMIT_SQLITE_PATH", os.path.join(workdir, "ratelimit.db"))
+        results = asyncio.run(run_against_server(ctx, args, env))
+    else:
+        results = asyncio.run(run_in_process(ctx, args))
+
+    report = {
+        "meta": {
+            "mode": f"server x{args.workers}" if args.server else "in-process",
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "dataset": {"products": args.products, "orders": args.orders, "users": args.users},
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        for line in found:
+            print("REGRESSION", line)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+
+from config import BULK_BATCH_SIZE
+from database import ReadSessionLocal, use_primary
+from models import Product
+from schemas import ProductCreate
+
+
+class ProductImport(ProductCreate):
+    # Rows with an id update that product in place (unknown ids are
+    # reported, not inserted), rows without one are new. stock only applies
+    # to new rows (see ProductCreate).
+    id: Optional[int] = None
+
+
+EXPORT_COLUMNS = [column.name for column in Product.__table__.columns]
+
+
+# -------- IMPORT --------
+async def iter_lines(chunks):
+    """Split a byte stream into decoded lines, keeping their line endings."""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8") + "\n"
+    if buffer:
+        yield buffer.decode("utf-8")
+
+async def read_ndjson(chunks):
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=f"Line {line_no}: {exc}")
+
+async def read_csv(chunks):
+    # A quoted field may span lines, so only hand csv complete records:
+    # an even number of quote characters means no field is left open.
+    # Records are numbered by the line they start on.
+    header = None
+    pending = []
+    quotes = 0
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        pending.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        start = line_no - len(pending) + 1
+        try:
+            records = list(csv.reader(pending))
+        except csv.Error as exc:
+            raise HTTPException(status_code=422, detail=f"Line {start}: {exc}")
+        for values in records:
+            if header is None:
+                header = values
+            elif values:
+                # Empty cells are NULLs, not empty strings
+                yield start, {key: value or None for key, value in zip(header, values)}
+        pending, quotes = [], 0
+    if pending:
+        start = line_no - len(pending) + 1
+        raise HTTPException(status_code=422, detail=f"Line {start}: quoted field is not closed")
+
+async def import_products(db, records) -> dict:
+    """Insert or update products from ``(line_no, dict)`` records in batched
+    statements. Ids that match no product are skipped and listed in
+    ``not_found``.
+
+    Everything runs in one transaction, so a bad row rejects the whole file.
+    """
+    stats = {"rows": 0, "inserted": 0, "updated": 0, "not_found": []}
+    batch = []
+    async for line_no, record in records:
+        try:
+            batch.append(ProductImport.model_validate(record).model_dump())
+        except ValidationError as exc:
+            errors = exc.errors(include_url=False, include_context=False, include_input=False)
+            raise HTTPException(status_code=422, detail=[{"line": line_no, **error} for error in errors])
+        if len(batch) >= BULK_BATCH_SIZE:
+            await write_batch(db, batch, stats)
+            batch = []
+    if batch:
+        await write_batch(db, batch, stats)
+    await db.commit()
+    return stats
+
+async def write_batch(db, batch: list, stats: dict):
+    new_rows = [row for row in batch if row["id"] is None]
+    existing_rows = [row for row in batch if row["id"] is not None]
+    if new_rows:
+        for row in new_rows:
+            del row["id"]
+        await db.execute(insert(Product), new_rows)
+    if existing_rows:
+        # Rows with an id only update: inserting one with an explicit id
+        # would leave the Postgres id sequence behind it
+        found = set((await db.scalars(
+            select(Product.id).where(Product.id.in_([row["id"] for row in existing_rows]))
+        )).all())
+        stats["not_found"].extend(row["id"] for row in existing_rows if row["id"] not in found)
+        existing_rows = [
+            {key: value for key, value in row.items() if key != "stock"}
+            for row in existing_rows if row["id"] in found
+        ]
+        if existing_rows:
+            # ORM bulk UPDATE by primary key: one executemany
+            await db.execute(update(Product), existing_rows)
+    stats["rows"] += len(batch)
+    stats["inserted"] += len(new_rows)
+    stats["updated"] += len(existing_rows)
+
+
+# -------- EXPORT --------
+async def export_products(fmt: str, primary: bool = False):
+    """Stream the catalog in id order without loading it into memory.
+
+    Uses its own session: the request's session is closed once the handler
+    returns, before the response body is streamed. Reads the replica unless
+    ``primary`` is set.
+    """
+    query = select(*Product.__table__.columns).order_by(Product.id)
+    async with ReadSessionLocal() as db:
+        if primary:
+            use_primary(db)
+        result = await db.stream(query.execution_options(yield_per=BULK_BATCH_SIZE))
+        if fmt == "csv":
+            yield csv_lines([EXPORT_COLUMNS])
+        async for rows in result.partitions():
+            if fmt == "csv":
+                yield csv_lines(rows)
+            else:
+                yield "".join(json.dumps(dict(row._mapping)) + "\n" for row in rows)
+
+def csv_lines(rows) -> str:
+    out = io.StringIO()
+    csv.writer(out).writerows(rows)
+    return out.getvalue()
@@ -0,0 +1,165 @@
+"""Catalog cache versions shared between worker processes.
+
+Every worker keeps its own response cache (cache.py). When one of them
+commits a catalog write the others must drop their copies too, and all of
+them must derive the same ETag from the same data, or a client whose
+requests land on different workers loses its 304s. A bus holds what they
+agree on: an epoch and one version per namespace.
+
+    LocalBus   a single process; versions are plain counters (the default)
+    SQLiteBus  every process that opens the same file; a stand-in for a
+               network bus such as Redis or Postgres LISTEN/NOTIFY
+
+The cache calls ``publish`` when it invalidates and ``poll`` before reading
+its versions. SQLiteBus.poll is one ``PRAGMA data_version`` unless another
+process has published since, so a write on one worker is seen by the next
+request on any other.
+
+The epoch is kept until ``python bus.py --reset``, which deployments run
+before starting the workers: data changed while the app was down (seeds,
+migrations) must not match ETags handed out before.
+"""
+import argparse
+import secrets
+import sqlite3
+import threading
+import time
+
+from config import CACHE_BUS, CACHE_BUS_SQLITE_PATH
+
+
+class BusState:
+    """Epoch, its start time, and {namespace: (version, modified_at)}."""
+
+    def __init__(self, epoch: str, started_at: float, versions: dict):
+        self.epoch = epoch
+        self.started_at = started_at
+        self.versions = versions
+
+
+class LocalBus:
+    name = "local"
+
+    def __init__(self):
+        self.state = BusState(secrets.token_hex(4), time.time(), {})
+
+    def poll(self):
+        """A new BusState if another process changed it, else None."""
+        return None
+
+    def publish(self, namespaces) -> dict:
+        """Bump the namespaces' versions; returns {namespace: (version, modified_at)}."""
+        now = time.time()
+        published = {}
+        for namespace in namespaces:
+            version = self.state.versions.get(namespace, (0, 0))[0] + 1
+            published[namespace] = self.state.versions[namespace] = (version, now)
+        return published
+
+
+class SQLiteBus:
+    """Versions in a small SQLite file shared by the workers of one host.
+
+    Calls are a few microseconds and made on the event loop; publish is one
+    IMMEDIATE transaction, so it can only wait on another worker's publish.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._data_version = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_epoch "
+                "(id INTEGER PRIMARY KEY CHECK (id = 1), epoch TEXT NOT NULL, started_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_versions "
+                "(namespace TEXT PRIMARY KEY, version INTEGER NOT NULL, modified_at REAL NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO cache_epoch VALUES (1, ?, ?)", (secrets.token_hex(4), time.time()))
+            self._conn = conn
+        return self._conn
+
+    def read_state(self, conn) -> BusState:
+        epoch, started_at = conn.execute("SELECT epoch, started_at FROM cache_epoch").fetchone()
+        versions = {
+            namespace: (version, modified_at)
+            for namespace, version, modified_at in conn.execute("SELECT namespace, version, modified_at FROM cache_versions")
+        }
+        return BusState(epoch, started_at, versions)
+
+    @property
+    def state(self) -> BusState:
+        with self._lock:
+            return self.read_state(self.connect())
+
+    def poll(self):
+        with self._lock:
+            conn = self.connect()
+            # Changes only when another connection commits to the file
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return None
+            self._data_version = data_version
+            conn.execute("BEGIN")
+            try:
+                return self.read_state(conn)
+            finally:
+                conn.execute("COMMIT")
+
+    def publish(self, namespaces) -> dict:
+        now = time.time()
+        with self._lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                published = {}
+                for namespace in namespaces:
+                    published[namespace] = conn.execute(
+                        "INSERT INTO cache_versions (namespace, version, modified_at) VALUES (?, 1, ?) "
+                        "ON CONFLICT(namespace) DO UPDATE SET version = version + 1, modified_at = excluded.modified_at "
+                        "RETURNING version, modified_at",
+                        (namespace, now),
+                    ).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return published
+
+    def reset(self):
+        """Start a new epoch with every version back at zero."""
+        with self._lock:
+            conn = self.connect()
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_versions")
+            conn.execute("UPDATE cache_epoch SET epoch = ?, started_at = ?", (secrets.token_hex(4), time.time()))
+            conn.execute("COMMIT")
+
+
+def create_bus(backend: str):
+    if backend == "local":
+        return LocalBus()
+    if backend == "sqlite":
+        return SQLiteBus(CACHE_BUS_SQLITE_PATH)
+    raise ValueError(f"Unknown CACHE_BUS {backend!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the shared catalog cache bus.")
+    parser.add_argument("--reset", action="store_true", help="start a new epoch (run before starting the workers)")
+    args = parser.parse_args()
+    bus = create_bus(CACHE_BUS)
+    if args.reset and isinstance(bus, SQLiteBus):
+        bus.reset()
+    state = bus.state
+    print(f"{bus.name} bus, epoch {state.epoch}: {state.versions or 'no versions yet'}")
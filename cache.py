@@ -0,0 +1,161 @@
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import NamedTuple
+
+from bus import LocalBus
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict
+    expires_at: float
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: compression middleware marks encoded bodies W/
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+
+def is_not_modified(request_headers, etag: str, last_modified: float) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        # If-None-Match takes precedence over If-Modified-Since
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class ResponseCache:
+    """Bounded TTL + LRU cache of rendered response bodies.
+
+    Entries are grouped by namespace (the table they were read from) so a
+    write can drop exactly the entries it made stale. Each namespace also
+    has a version, bumped on every invalidation: it stops a read that raced
+    with a write from storing its now-stale body, and it is what ETag and
+    Last-Modified are derived from, so validators are known before any body
+    is rendered. Versions live on a bus (bus.py) so that several worker
+    processes invalidate together and agree on validators.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, bus=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.bus = bus if bus is not None else LocalBus()
+        # Part of every ETag, so tags handed out in an earlier epoch never
+        # match; read from the bus on first use
+        self.epoch = None
+        self.started_at = None
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._modified_at = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def generation(self, namespace: str) -> int:
+        return self._generations.get(namespace, 0)
+
+    def validators(self, namespace: str):
+        """(generation, ETag, Last-Modified timestamp) for a namespace, read together."""
+        self.sync()
+        with self._lock:
+            generation = self.generation(namespace)
+            etag = f'"{namespace}-{self.epoch}-{generation}"'
+            return generation, etag, self._modified_at.get(namespace, self.started_at)
+
+    def get(self, namespace: str, key: str):
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                del self._entries[(namespace, key)]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end((namespace, key))
+            self.hits += 1
+            return entry
+
+    def set(self, namespace: str, key: str, body: bytes, headers: dict, generation: int) -> CachedResponse:
+        entry = CachedResponse(body, headers, time.monotonic() + self.ttl)
+        with self._lock:
+            if generation != self.generation(namespace):
+                return entry
+            self._entries[(namespace, key)] = entry
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def sync(self):
+        """Apply versions other processes published, dropping what they made stale."""
+        state = self.bus.poll() if self.epoch is not None else self.bus.state
+        if state is None:
+            return
+        with self._lock:
+            if state.epoch != self.epoch:
+                self.epoch, self.started_at = state.epoch, state.started_at
+                self._generations, self._modified_at = {}, {}
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            changed = {
+                namespace: published for namespace, published in state.versions.items()
+                if published[0] != self.generation(namespace)
+            }
+            self._apply(changed)
+
+    def invalidate(self, *namespaces: str):
+        if self.epoch is None:
+            self.sync()
+        published = self.bus.publish(namespaces)
+        with self._lock:
+            self._apply(published)
+
+    def _apply(self, published: dict):
+        if not published:
+            return
+        for namespace, (version, modified_at) in published.items():
+            self._generations[namespace] = version
+            self._modified_at[namespace] = modified_at
+        stale = [key for key in self._entries if key[0] in published]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self) -> dict:
+        self.sync()
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "bus": self.bus.name,
+                "epoch": self.epoch,
+                "versions": dict(self._generations),
+            }
+
+
+def http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
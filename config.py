@@ -0,0 +1,181 @@
+import os
+
+
+# Settings are read once from the environment at import time
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# -------- PROCESSES --------
+# Server worker processes (uvicorn reads the same variable). Anything shared
+# between workers defaults to a host-local SQLite file when there are several.
+WEB_CONCURRENCY = env_int("WEB_CONCURRENCY", 1)
+SHARED_BACKEND = "sqlite" if WEB_CONCURRENCY > 1 else None
+
+
+# -------- CATALOG CACHE --------
+CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 512)
+CACHE_TTL_SECONDS = env_float("CACHE_TTL_SECONDS", 300)
+# Where cache versions live (see bus.py): "local" to the process, or
+# "sqlite" to share invalidations and ETags between workers
+CACHE_BUS = os.getenv("CACHE_BUS", SHARED_BACKEND or "local")
+CACHE_BUS_SQLITE_PATH = os.getenv("CACHE_BUS_SQLITE_PATH", "./cache_bus.db")
+
+
+# -------- DATABASE --------
+# Some hosts still hand out the pre-SQLAlchemy-1.4 "postgres://" scheme
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./ecommerce.db")
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = "postgresql://" + DATABASE_URL[len("postgres://"):]
+
+# Connection pool, applied to both the sync and async engines
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+
+# SQLite pragmas set on every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)
+SQLITE_MMAP_SIZE = env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+
+# Request handlers always run on an async engine; there is no sync request
+# mode to switch back to. The driver follows the backend of DATABASE_URL
+# unless ASYNC_DATABASE_URL names one explicitly. The sync engine built from
+# DATABASE_URL is only used by migrations and the seeding scripts.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} URLs")
+    return f"{ASYNC_DRIVERS[backend]}://{rest}"
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+# Optional read replica for GET handlers; without one they read the primary.
+# Locally a read-only connection to the same SQLite file stands in for one:
+#   READ_DATABASE_URL="sqlite:///file:./ecommerce.db?mode=ro&uri=true"
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+if READ_DATABASE_URL and READ_DATABASE_URL.startswith("postgres://"):
+    READ_DATABASE_URL = "postgresql://" + READ_DATABASE_URL[len("postgres://"):]
+ASYNC_READ_DATABASE_URL = async_url(READ_DATABASE_URL) if READ_DATABASE_URL else None
+# After a client's write, or any change to a catalog table, reads go to the
+# primary for this long; set it above the replica's worst lag
+READ_YOUR_WRITES_SECONDS = env_float("READ_YOUR_WRITES_SECONDS", 5)
+# SameSite of the cookie that marks a client's last write. Set from config,
+# not the request scheme: TLS usually ends at a proxy, and the frontend is
+# on another site, so it needs "none" (sent with Secure) to get it back.
+LAST_WRITE_COOKIE_SAMESITE = os.getenv("LAST_WRITE_COOKIE_SAMESITE", "none")
+
+
+# -------- PASSWORD HASHING --------
+BCRYPT_ROUNDS = env_int("BCRYPT_ROUNDS", 12)
+# "thread" is enough because bcrypt releases the GIL; "process" isolates it fully
+HASH_POOL = os.getenv("HASH_POOL", "thread")
+# Per server worker, so together they use about half the cores
+HASH_WORKERS = env_int("HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2 // WEB_CONCURRENCY))
+# Hash jobs allowed to wait or run at once before /login and /register shed load
+HASH_MAX_PENDING = env_int("HASH_MAX_PENDING", 64)
+
+
+# -------- BULK IMPORT / EXPORT --------
+BULK_BATCH_SIZE = env_int("BULK_BATCH_SIZE", 1000)
+
+
+# -------- SERIALIZATION --------
+# Opt-in: list endpoints encode plain column rows with orjson instead of
+# validating ORM objects through the response schemas
+FAST_JSON = env_bool("FAST_JSON", False)
+
+
+# -------- COMPRESSION --------
+COMPRESS_MIN_SIZE = env_int("COMPRESS_MIN_SIZE", 1024)
+GZIP_LEVEL = env_int("GZIP_LEVEL", 6)
+# 4 is close to gzip -6 in speed while compressing JSON noticeably better
+BROTLI_QUALITY = env_int("BROTLI_QUALITY", 4)
+
+
+# -------- METRICS --------
+# Statements slower than this are logged with their SQL
+SLOW_QUERY_MS = env_float("SLOW_QUERY_MS", 200)
+# Requests issuing more statements than this are logged as likely N+1s
+N_PLUS_ONE_THRESHOLD = env_int("N_PLUS_ONE_THRESHOLD", 20)
+
+
+# -------- RATE LIMITING --------
+RATE_LIMIT_ENABLED = env_bool("RATE_LIMIT_ENABLED", True)
+# "memory" keeps buckets per process; "sqlite" shares them between the
+# workers of one host through a small database file
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", SHARED_BACKEND or "memory")
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "./ratelimit.db")
+# "<requests>/<second|minute|hour>": the bucket refills at that rate and
+# holds that many requests as burst
+LOGIN_IP_RATE = os.getenv("LOGIN_IP_RATE", "30/minute")
+LOGIN_USER_RATE = os.getenv("LOGIN_USER_RATE", "10/minute")
+REGISTER_IP_RATE = os.getenv("REGISTER_IP_RATE", "10/minute")
+CATALOG_IP_RATE = os.getenv("CATALOG_IP_RATE", "600/minute")
+ORDER_USER_RATE = os.getenv("ORDER_USER_RATE", "60/minute")
+
+# Requests served at once (per worker) before new ones are shed with 503; a
+# request may wait up to ADMISSION_TIMEOUT seconds for a slot first
+MAX_CONCURRENT_REQUESTS = env_int("MAX_CONCURRENT_REQUESTS", 100)
+ADMISSION_TIMEOUT = env_float("ADMISSION_TIMEOUT", 0.5)
+
+
+# -------- TOKENS --------
+# HMAC key for access/refresh tokens. Without one, each process makes up its
+# own, so tokens stop working on restart and aren't shared between workers.
+SECRET_KEY = os.getenv("SECRET_KEY")
+ACCESS_TOKEN_TTL = env_int("ACCESS_TOKEN_TTL", 15 * 60)
+REFRESH_TOKEN_TTL = env_int("REFRESH_TOKEN_TTL", 7 * 24 * 3600)
+
+
+# -------- STARTUP --------
+# Apply pending migrations at startup instead of refusing to start; meant
+# for local development, deployments run "python migrations.py" first
+AUTO_MIGRATE = env_bool("AUTO_MIGRATE", False)
+WARMUP = env_bool("WARMUP", True)
+# Pool connections opened before the first request
+WARMUP_CONNECTIONS = env_int("WARMUP_CONNECTIONS", min(4, DB_POOL_SIZE))
+# GET requests served once at startup to fill the catalog cache
+WARMUP_PATHS = [path for path in os.getenv("WARMUP_PATHS", "/categories,/offers,/products").split(",") if path]
+
+
+# -------- BACKGROUND JOBS --------
+# Worker tasks per process; 0 only enqueues (another process does the work)
+JOB_WORKERS = env_int("JOB_WORKERS", 2)
+# How often idle workers look for delayed retries and other processes' jobs
+JOB_POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 1.0)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 5)
+# Retry n waits about JOB_BACKOFF_BASE * 2**(n-1) seconds, capped
+JOB_BACKOFF_BASE = env_float("JOB_BACKOFF_BASE", 2.0)
+JOB_BACKOFF_MAX = env_float("JOB_BACKOFF_MAX", 300.0)
+JOB_LEASE_SECONDS = env_float("JOB_LEASE_SECONDS", 300.0)
+
+
+# -------- IMAGES --------
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", "./media")
+# Prefix of the variant URLs stored on products
+MEDIA_URL = os.getenv("MEDIA_URL", "/media")
+IMAGE_MAX_BYTES = env_int("IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+# Longest edge of each variant, in pixels
+IMAGE_THUMB_SIZE = env_int("IMAGE_THUMB_SIZE", 200)
+IMAGE_MEDIUM_SIZE = env_int("IMAGE_MEDIUM_SIZE", 640)
+IMAGE_QUALITY = env_int("IMAGE_QUALITY", 80)
+IMAGE_WORKERS = env_int("IMAGE_WORKERS", max(1, (os.cpu_count() or 2) // 2 // WEB_CONCURRENCY))
@@ -1,15 +1,136 @@
-from sqlalchemy import create_engine
+from starlette.requests import Request
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
+from config import (
+    DATABASE_URL, ASYNC_DATABASE_URL, ASYNC_READ_DATABASE_URL, READ_YOUR_WRITES_SECONDS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS, SQLITE_MMAP_SIZE,
+)
+from middleware import wrote_recently
 
-# SQLite (local demo DB)
-SQLALCHEMY_DATABASE_URL = "sqlite:///./ecommerce.db"
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in DATABASE_URL or DATABASE_URL.rstrip("/") == "sqlite:")
 
-# For SQLite we need check_same_thread=False
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def engine_options(is_async: bool = False) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if IS_SQLITE_MEMORY:
+        # One shared connection, otherwise every connection sees its own empty database
+        options["poolclass"] = StaticPool
+    else:
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+        if is_async and IS_SQLITE:
+            # aiosqlite defaults to NullPool, which opens a connection and a
+            # thread per request
+            options["poolclass"] = AsyncAdaptedQueuePool
+    if IS_SQLITE:
+        # For SQLite we need check_same_thread=False
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the single writer instead of blocking
+    # on the rollback journal; NORMAL only syncs at checkpoints under WAL.
+    cursor = dbapi_connection.cursor()
+    if not IS_SQLITE_MEMORY:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+# Sync engine: table creation and the seeding scripts
+engine = create_engine(DATABASE_URL, **engine_options())
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine: the request path (aiosqlite / asyncpg)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(is_async=True))
+
+# Read engine: GET handlers, through get_read_db. A replica on the same
+# backend as the primary, or the primary itself when none is configured.
+if ASYNC_READ_DATABASE_URL:
+    read_engine = create_async_engine(ASYNC_READ_DATABASE_URL, **engine_options(is_async=True))
+else:
+    read_engine = async_engine
+
+if IS_SQLITE:
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragmas)
+    if read_engine is not async_engine:
+        event.listen(read_engine.sync_engine, "connect", set_sqlite_pragmas)
+
+# expire_on_commit=False: returning an object after commit must not trigger
+# a lazy reload, which is not allowed outside of an await
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+class ReadSession(Session):
+    """Reads from the replica, or from the primary once use_primary() is called."""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("primary"):
+            return async_engine.sync_engine
+        return read_engine.sync_engine
+
+ReadSessionLocal = async_sessionmaker(sync_session_class=ReadSession, autoflush=False, expire_on_commit=False)
+
+def use_primary(db):
+    """Send a read session's queries to the primary; call before its first query."""
+    db.info["primary"] = True
+
 Base = declarative_base()
+
+def create_tables(conn):
+    """Create missing tables, then columns and indexes added since a table was created.
+
+    create_all skips tables that already exist, so newer nullable columns
+    are added with ALTER TABLE and newer indexes created one by one. Only
+    called from migrations.py.
+    """
+    Base.metadata.create_all(bind=conn)
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                add_column(conn, column)
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+def add_column(conn, column, checkfirst: bool = False):
+    """ALTER TABLE ... ADD COLUMN for a (nullable) model column."""
+    table = column.table
+    if checkfirst and column.name in {c["name"] for c in inspect(conn).get_columns(table.name)}:
+        return
+    quote = conn.dialect.identifier_preparer.quote
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+
+# INSERT with the dialect's ON CONFLICT support (both backends spell it the
+# same). Imported per backend: the postgresql package pulls in every driver.
+if IS_SQLITE:
+    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+else:
+    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+
+# Dependencies
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# For handlers that only read. A client that wrote within
+# READ_YOUR_WRITES_SECONDS (see LastWriteMiddleware) reads the primary, so
+# replica lag never hides its own changes from it.
+async def get_read_db(request: Request):
+    async with ReadSessionLocal() as db:
+        if wrote_recently(request, READ_YOUR_WRITES_SECONDS):
+            use_primary(db)
+        yield db
@@ -0,0 +1,117 @@
+"""Uploaded product images: originals on disk, resized WebP variants.
+
+Files are named after the SHA-256 of the original plus the variant size, so
+a URL always means the same bytes and can be cached forever; a new upload
+gets new URLs. Layout under MEDIA_ROOT:
+
+    originals/<key>.<ext>
+    <key>-thumb200.webp
+    <key>-medium640.webp
+
+Resizing runs in a process pool (Pillow holds the GIL for most of it).
+Pillow is optional; without it uploads are refused with 503.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from config import MEDIA_ROOT, MEDIA_URL, IMAGE_THUMB_SIZE, IMAGE_MEDIUM_SIZE, IMAGE_QUALITY, IMAGE_WORKERS
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: image uploads only
+    Image = None
+
+VARIANTS = {"thumb": IMAGE_THUMB_SIZE, "medium": IMAGE_MEDIUM_SIZE}
+# Pillow format name -> extension for stored originals
+FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+VARIANT_NAME = re.compile(r"^[0-9a-f]{16}-[a-z]+[0-9]+\.webp$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def content_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def variant_filename(key: str, variant: str) -> str:
+    return f"{key}-{variant}{VARIANTS[variant]}.webp"
+
+def variant_urls(key: str) -> dict:
+    return {variant: f"{MEDIA_URL}/{variant_filename(key, variant)}" for variant in VARIANTS}
+
+def media_path(filename: str):
+    """Path of a servable variant, or None for any other name."""
+    if not VARIANT_NAME.match(filename):
+        return None
+    return os.path.join(MEDIA_ROOT, filename)
+
+def original_path(key: str, ext: str) -> str:
+    return os.path.join(MEDIA_ROOT, "originals", f"{key}.{ext}")
+
+def write_atomic(path: str, data: bytes):
+    # Readers see the whole file or none of it
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def store_original(data: bytes):
+    """Check ``data`` is a supported image and save it; returns (key, ext).
+
+    Raises ValueError for anything Pillow can't identify or we don't accept.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+            image_format = img.format
+    except Exception as exc:
+        raise ValueError("Not a readable image") from exc
+    if image_format not in FORMATS:
+        raise ValueError(f"Unsupported image format {image_format}")
+    key, ext = content_key(data), FORMATS[image_format]
+    path = original_path(key, ext)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, data)
+    return key, ext
+
+def make_variants(key: str, ext: str):
+    """Write every missing variant of a stored original (runs in the pool)."""
+    with Image.open(original_path(key, ext)) as img:
+        # Apply the camera's rotation before it's dropped with the EXIF data
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+        for variant, size in VARIANTS.items():
+            path = os.path.join(MEDIA_ROOT, variant_filename(key, variant))
+            if os.path.exists(path):
+                continue
+            resized = img.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, "WEBP", quality=IMAGE_QUALITY, method=4)
+            write_atomic(path, buffer.getvalue())
+
+
+class ImagePool:
+    """Lazily started process pool for resizing."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+
+    async def run(self, fn, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_pool = ImagePool(IMAGE_WORKERS)
@@ -0,0 +1,173 @@
+"""In-process background jobs over a persistent outbox table.
+
+Request handlers call ``enqueue(db, kind, payload)`` before committing, so a
+job exists if and only if the change that caused it was committed. Worker
+tasks started in the app lifespan claim due jobs with a conditional UPDATE
+(safe with several workers or processes), run the registered handler in a
+fresh transaction that also deletes the job, and on failure reschedule it
+with exponential backoff until JOB_MAX_ATTEMPTS, after which it is kept as
+"failed" for inspection.
+
+A handler's database writes commit together with the job's deletion, so
+they happen exactly once; anything outside the database (notifications) is
+at least once. Handlers may return a callable to run after that commit.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from config import (
+    JOB_WORKERS, JOB_POLL_INTERVAL, JOB_MAX_ATTEMPTS,
+    JOB_BACKOFF_BASE, JOB_BACKOFF_MAX, JOB_LEASE_SECONDS,
+)
+from metrics import Counter, Gauge, Histogram
+from models import Job
+
+logger = logging.getLogger("jobs")
+
+jobs_processed = Counter("jobs_processed_total", "Background jobs run, by kind and outcome.")
+jobs_duration = Histogram("jobs_duration_seconds", "Background job handler run time.")
+jobs_lag = Histogram(
+    "jobs_lag_seconds", "Delay between a job becoming due and a worker claiming it.",
+    (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+jobs_depth = Gauge("jobs_queue_depth", "Jobs in the outbox by status.")
+jobs_oldest = Gauge("jobs_oldest_due_seconds", "How long the oldest due pending job has been waiting.")
+
+
+def enqueue(db, kind: str, payload: dict, delay: float = 0) -> Job:
+    """Add a job to the caller's transaction; it runs once that commits."""
+    job = Job(kind=kind, payload=payload, run_at=datetime.utcnow() + timedelta(seconds=delay))
+    db.add(job)
+    return job
+
+def backoff(attempts: int) -> float:
+    # Full jitter keeps a batch of failed jobs from retrying in lockstep
+    return min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+def claimable(now: datetime):
+    return or_(
+        and_(Job.status == "pending", Job.run_at <= now),
+        and_(Job.status == "running", Job.locked_until < now),
+    )
+
+
+class JobQueue:
+    def __init__(self, session_factory, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.handlers = {}
+        self._tasks = []
+        self._wakeup = None
+
+    def handler(self, kind: str):
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    def wake(self):
+        """Tell idle workers new jobs were committed, instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        # A job interrupted here stays "running" and is retried when its lease ends
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def worker(self):
+        while True:
+            try:
+                job = await self.claim()
+            except Exception:
+                logger.exception("Claiming a job failed")
+                job = None
+            if job is not None:
+                await self.run(job)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim(self):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            candidates = (await db.scalars(
+                select(Job.id).where(claimable(now)).order_by(Job.run_at, Job.id).limit(self.workers)
+            )).all()
+            for job_id in candidates:
+                # Only one worker's UPDATE can still match; the rest move on
+                claimed = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, claimable(now))
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if claimed.rowcount == 1:
+                    job = await db.get(Job, job_id)
+                    await db.commit()
+                    jobs_lag.observe(max(0.0, (now - job.run_at).total_seconds()), kind=job.kind)
+                    return job
+            await db.commit()
+        return None
+
+    async def run(self, job: Job):
+        handler = self.handlers.get(job.kind)
+        started = time.perf_counter()
+        async with self.session_factory() as db:
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind {job.kind!r}")
+                after_commit = await handler(db, job.payload)
+                await db.execute(delete(Job).where(Job.id == job.id))
+                await db.commit()
+            except Exception as exc:
+                await db.rollback()
+                await self.retry_later(db, job, exc)
+                return
+            finally:
+                jobs_duration.observe(time.perf_counter() - started, kind=job.kind)
+        jobs_processed.inc(kind=job.kind, outcome="done")
+        if after_commit is not None:
+            after_commit()
+
+    async def retry_later(self, db, job: Job, exc: Exception):
+        failed = job.attempts >= JOB_MAX_ATTEMPTS
+        values = {"status": "failed" if failed else "pending", "last_error": f"{type(exc).__name__}: {exc}"[:1000]}
+        if not failed:
+            values["run_at"] = datetime.utcnow() + timedelta(seconds=backoff(job.attempts))
+        await db.execute(update(Job).where(Job.id == job.id).values(**values))
+        await db.commit()
+        jobs_processed.inc(kind=job.kind, outcome="failed" if failed else "retried")
+        log = logger.error if failed else logger.warning
+        log("Job %s (%s) attempt %d failed: %s", job.id, job.kind, job.attempts, exc)
+
+    async def stats(self) -> dict:
+        """Outbox depth by status and the age of the oldest due job; also refreshes the gauges."""
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            depth = dict((await db.execute(select(Job.status, func.count()).group_by(Job.status))).all())
+            oldest = await db.scalar(select(func.min(Job.run_at)).where(Job.status == "pending", Job.run_at <= now))
+        for status in ("pending", "running", "failed"):
+            jobs_depth.set(depth.get(status, 0), status=status)
+        oldest_due = (now - oldest).total_seconds() if oldest else 0.0
+        jobs_oldest.set(oldest_due)
+        return {"workers": len(self._tasks), "depth": depth, "oldest_due_seconds": oldest_due}
@@ -1,22 +1,140 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from datetime import date, datetime
+from typing import Literal, Optional, Union
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from sqlalchemy import or_, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, noload
+from sqlalchemy.orm.attributes import set_committed_value
 from fastapi.middleware.cors import CORSMiddleware
-from database import Base, engine, SessionLocal
-from models import User, Product, Offer, Category, Order
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+from database import AsyncSessionLocal, async_engine, read_engine, get_db, get_read_db, use_primary
+from migrations import migrate, pending_migrations
+from models import User, Product, Offer, Category, Order, OrderStatusTotal, ProductSales, CategoryDailySales
 from schemas import (
-    UserCreate, UserOut, UserLogin,
-    ProductBase, ProductOut,
-    OfferBase, OfferOut,
-    CategoryBase, CategoryOut,
-    OrderBase, OrderOut
+    UserCreate, UserOut, UserLogin, TokenRefresh,
+    ProductBase, ProductCreate, ProductOut, ProductPatch, ProductDetailOut, ProductSearchHit,
+    OfferBase, OfferOut, OfferPatch,
+    CategoryBase, CategoryOut, CategoryPatch,
+    OrderCreate, OrderOut, OrderBatch,
+    StatusTotalOut, ProductSalesOut, CategoryRevenueOut,
 )
-from auth import hash_password, verify_password
-from pydantic import BaseModel
+from auth import hash_pool, hash_password_async, verify_and_update_async, warm_up_hash_pool
+from tokens import TokenUser, issue_tokens, decode_token, credentials_error, optional_user, require_admin
+from pagination import encode_cursor, decode_cursor, is_int, is_number, is_offset, is_timestamp
+from analytics import record_order, record_status_change
+from writes import insert_row, update_row, update_ids, delete_row, exists
+import images
+from images import image_pool, make_variants, media_path, store_original, variant_urls
+from jobs import JobQueue, enqueue
+from search import search_products
+from bulk import read_csv, read_ndjson, import_products, export_products
+from bus import create_bus
+from cache import ResponseCache, is_not_modified, http_date
+from middleware import BodyLimitMiddleware, CompressionMiddleware, LastWriteMiddleware, wrote_recently
+from metrics import MetricsMiddleware, Gauge, COLLECTORS, instrument_engine, render_metrics
+from serialization import ListRenderer, orjson
+from ratelimit import RateLimit, AdmissionMiddleware
+from config import (
+    CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, CACHE_BUS, FAST_JSON,
+    COMPRESS_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY,
+    LOGIN_IP_RATE, LOGIN_USER_RATE, REGISTER_IP_RATE, CATALOG_IP_RATE, ORDER_USER_RATE,
+    MAX_CONCURRENT_REQUESTS, ADMISSION_TIMEOUT,
+    AUTO_MIGRATE, WARMUP, WARMUP_CONNECTIONS, WARMUP_PATHS,
+    IMAGE_MAX_BYTES, READ_YOUR_WRITES_SECONDS, LAST_WRITE_COOKIE_SAMESITE,
+)
+from pydantic import BaseModel, Field, TypeAdapter
+
+logger = logging.getLogger(__name__)
+
+# -------- STARTUP --------
+# Importing this module does no I/O. The schema is migrated beforehand by
+# "python migrations.py"; startup only checks the version, then warms up.
+async def check_schema():
+    async with async_engine.connect() as conn:
+        pending = await conn.run_sync(pending_migrations)
+    if not pending:
+        return
+    if not AUTO_MIGRATE:
+        names = ", ".join(f"{version} {name}" for version, name in pending)
+        raise RuntimeError(f"Database schema is out of date (pending: {names}); run python migrations.py")
+    await run_in_threadpool(migrate)
+
+async def warm_request(path: str):
+    # One GET through the whole app, as uvicorn would send it
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": [(b"host", b"warmup")], "client": ("127.0.0.1", 0), "server": ("warmup", 80),
+    }
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] >= 400:
+            logger.warning("Warm-up GET %s returned %s", path, message["status"])
+    await app(scope, receive, send)
+
+async def warm_up():
+    # Open connections (and run their pragmas) now rather than on the first requests
+    async with AsyncExitStack() as stack:
+        for engine in {async_engine, read_engine}:
+            for _ in range(WARMUP_CONNECTIONS):
+                conn = await stack.enter_async_context(engine.connect())
+                await conn.execute(text("SELECT 1"))
+    # Fills the catalog cache and builds everything routes create lazily
+    for path in WARMUP_PATHS:
+        await warm_request(path)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await check_schema()
+    background = []
+    if WARMUP:
+        await warm_up()
+        # bcrypt's backend load is the slowest part; don't hold up startup for it
+        background.append(asyncio.create_task(warm_up_hash_pool()))
+    job_queue.start()
+    yield
+    for task in background:
+        task.cancel()
+    await job_queue.stop()
+    hash_pool.shutdown()
+    image_pool.shutdown()
+    # Close pooled connections; aiosqlite keeps a thread per connection
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if FAST_JSON and orjson else JSONResponse,
+)
+
+# Innermost of the middleware, so shed requests still get CORS headers and
+# preflights are answered without taking a slot
+app.add_middleware(AdmissionMiddleware, max_concurrent=MAX_CONCURRENT_REQUESTS, timeout=ADMISSION_TIMEOUT)
+
+# Uploads are refused on their Content-Length before the form is parsed and
+# spooled; the endpoint still checks the file itself. The slack covers the
+# multipart boundaries and part headers.
+app.add_middleware(BodyLimitMiddleware, limits=[
+    ("POST", r"/products/[^/]+/image", IMAGE_MAX_BYTES + 64 * 1024),
+])
 
-app = FastAPI()
+# Only needed when reads can go to a replica (see get_read_db)
+if read_engine is not async_engine:
+    app.add_middleware(
+        LastWriteMiddleware,
+        window=READ_YOUR_WRITES_SECONDS,
+        same_site=LAST_WRITE_COOKIE_SAMESITE,
+        exempt=("/login", "/register", "/token/refresh"),
+    )
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -29,179 +147,827 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESS_MIN_SIZE,
+    gzip_level=GZIP_LEVEL,
+    brotli_quality=BROTLI_QUALITY,
+)
+
+# Outermost, so latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+instrument_engine(async_engine.sync_engine)
+if read_engine is not async_engine:
+    instrument_engine(read_engine.sync_engine, "replica")
+
+# Per-client token buckets (see ratelimit.py); 429 with Retry-After when empty
+login_ip_limit = RateLimit("login-ip", LOGIN_IP_RATE)
+login_user_limit = RateLimit("login-user", LOGIN_USER_RATE, key="username")
+register_limit = RateLimit("register-ip", REGISTER_IP_RATE)
+catalog_limit = RateLimit("catalog-ip", CATALOG_IP_RATE)
+order_limit = RateLimit("order-user", ORDER_USER_RATE, key="user")
+
+# Catalog read cache: categories, offers and products only change through
+# the handlers below, which invalidate their namespace after each commit.
+# With several workers the bus carries that to the others' caches too.
+catalog_cache = ResponseCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, create_bus(CACHE_BUS))
+
+category_list = ListRenderer(Category, CategoryOut)
+offer_list = ListRenderer(Offer, OfferOut)
+product_list = ListRenderer(Product, ProductOut)
+order_list = ListRenderer(Order, OrderOut)
+product_detail = TypeAdapter(ProductDetailOut)
+product_detail_list = TypeAdapter(list[ProductDetailOut])
+search_hit_list = TypeAdapter(list[ProductSearchHit])
+
+def dump_list(adapter: TypeAdapter, rows) -> bytes:
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+async def cached_response(request: Request, db: AsyncSession, namespace: str, render):
+    """Serve a JSON body from the catalog cache, rendering it on a miss.
+
+    ``render`` is a coroutine function returning the body bytes and any extra
+    headers to cache with it, read through ``db``. ETag and Last-Modified
+    come from the namespace's version, so conditional requests get their 304
+    before the cache or the database is touched.
+    """
+    generation, etag, last_modified = catalog_cache.validators(namespace)
+    validators = {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        # Let clients keep the body but revalidate on every use
+        "Cache-Control": "no-cache",
+    }
+    if is_not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=validators)
+    key = request.url.path + "?" + request.url.query
+    entry = catalog_cache.get(namespace, key)
+    if entry is None:
+        # Every client gets the cached body, so don't fill it from a replica
+        # that may not have the namespace's latest write yet
+        if time.time() - last_modified < READ_YOUR_WRITES_SECONDS:
+            use_primary(db)
+        body, headers = await render()
+        entry = catalog_cache.set(namespace, key, body, headers, generation)
+    return Response(entry.body, media_type="application/json", headers={**validators, **entry.headers})
 
 # -------- AUTH --------
-@app.post("/register", response_model=UserOut)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.username == user.username).first():
+@app.post("/register", response_model=UserOut, dependencies=[Depends(register_limit)])
+async def register(
+    user: UserCreate,
+    caller: Optional[TokenUser] = Depends(optional_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Anyone may sign up, but only an admin can create privileged accounts
+    if user.role != "user" and (caller is None or caller.role != "admin"):
+        raise HTTPException(status_code=403, detail="Only admins can create non-user accounts")
+    if await db.scalar(select(User).where(User.username == user.username)):
         raise HTTPException(status_code=400, detail="Username exists")
-    hashed = hash_password(user.password)
+    # End the read transaction so bcrypt doesn't hold a pooled connection
+    await db.commit()
+    hashed = await hash_password_async(user.password)
     new_user = User(username=user.username, password=hashed, role=user.role)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    # expire_on_commit=False: every column is still loaded, no refresh needed
     return new_user
 
-@app.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.password):
+@app.post("/login", dependencies=[Depends(login_ip_limit), Depends(login_user_limit)])
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.username == user.username))
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    await db.commit()
+    valid, new_hash = await verify_and_update_async(user.password, db_user.password)
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    return {"username": db_user.username, "role": db_user.role}
+    if new_hash:
+        # Stored hash uses an outdated scheme or cost; upgrade it transparently
+        db_user.password = new_hash
+        await db.commit()
+    return {"username": db_user.username, "role": db_user.role, **issue_tokens(db_user.username, db_user.role)}
+
+# Trade a refresh token for a new pair. Re-reads the user (one indexed
+# lookup, no bcrypt) so role changes and deletions apply from here on.
+@app.post("/token/refresh")
+async def refresh_token(body: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    claims = decode_token(body.refresh_token, "refresh")
+    db_user = await db.scalar(select(User).where(User.username == claims["sub"]))
+    if not db_user:
+        raise credentials_error()
+    return {"username": db_user.username, "role": db_user.role, **issue_tokens(db_user.username, db_user.role)}
+
+
+# -------- WRITES --------
+# PUT and PATCH share this: one UPDATE ... RETURNING (see writes.py)
+async def save_row(db: AsyncSession, model, row_id: int, values: dict, namespaces: tuple):
+    if values:
+        row = await update_row(db, model, row_id, values)
+    else:
+        # Empty PATCH: nothing to write, answer with the current row
+        row = (await db.execute(select(*model.__table__.columns).where(model.id == row_id))).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail=f"{model.__name__} not found")
+    await db.commit()
+    catalog_cache.invalidate(*namespaces)
+    return row
 
 
 # -------- CATEGORIES --------
 @app.get("/categories", response_model=list[CategoryOut])
-def get_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
-
-@app.post("/categories", response_model=CategoryOut)
-def create_category(category: CategoryBase, db: Session = Depends(get_db)):
-    new_cat = Category(name=category.name)
-    db.add(new_cat)
-    db.commit()
-    db.refresh(new_cat)
-    return new_cat
-
-@app.put("/categories/{category_id}", response_model=CategoryOut)
-def update_category(category_id: int, category: CategoryBase, db: Session = Depends(get_db)):
-    db_cat = db.query(Category).filter(Category.id == category_id).first()
-    if not db_cat:
-        raise HTTPException(status_code=404, detail="Category not found")
-    db_cat.name = category.name
-    db.commit()
-    db.refresh(db_cat)
-    return db_cat
-
-@app.delete("/categories/{category_id}")
-def delete_category(category_id: int, db: Session = Depends(get_db)):
-    db_cat = db.query(Category).filter(Category.id == category_id).first()
-    if not db_cat:
+async def get_categories(request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def render():
+        return category_list.dump(await category_list.fetch(db, category_list.select())), {}
+    return await cached_response(request, db, "categories", render)
+
+@app.post("/categories", response_model=CategoryOut, dependencies=[Depends(require_admin)])
+async def create_category(category: CategoryBase, db: AsyncSession = Depends(get_db)):
+    row = await insert_row(db, Category, category.dict())
+    await db.commit()
+    # Expanded product responses embed categories
+    catalog_cache.invalidate("categories", "products")
+    return row
+
+@app.put("/categories/{category_id}", response_model=CategoryOut, dependencies=[Depends(require_admin)])
+async def update_category(category_id: int, category: CategoryBase, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Category, category_id, category.dict(), ("categories", "products"))
+
+@app.patch("/categories/{category_id}", response_model=CategoryOut, dependencies=[Depends(require_admin)])
+async def patch_category(category_id: int, category: CategoryPatch, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Category, category_id, category.dict(exclude_unset=True), ("categories", "products"))
+
+@app.delete("/categories/{category_id}", dependencies=[Depends(require_admin)])
+async def delete_category(category_id: int, db: AsyncSession = Depends(get_db)):
+    # products.category_id is NOT NULL, so a category in use can't go
+    in_use = select(Product.id).where(Product.category_id == category_id).exists()
+    if await delete_row(db, Category, category_id, ~in_use) is None:
+        if await exists(db, Category, category_id):
+            raise HTTPException(status_code=409, detail="Category has products")
         raise HTTPException(status_code=404, detail="Category not found")
-    db.delete(db_cat)
-    db.commit()
+    await db.commit()
+    catalog_cache.invalidate("categories", "products")
     return {"detail": "Category deleted"}
 
 
 # -------- OFFERS --------
 @app.get("/offers", response_model=list[OfferOut])
-def get_offers(db: Session = Depends(get_db)):
-    return db.query(Offer).all()
-
-@app.post("/offers", response_model=OfferOut)
-def create_offer(offer: OfferBase, db: Session = Depends(get_db)):
-    new_offer = Offer(title=offer.title, discount=offer.discount)
-    db.add(new_offer)
-    db.commit()
-    db.refresh(new_offer)
-    return new_offer
-
-@app.put("/offers/{offer_id}", response_model=OfferOut)
-def update_offer(offer_id: int, offer: OfferBase, db: Session = Depends(get_db)):
-    db_offer = db.query(Offer).filter(Offer.id == offer_id).first()
-    if not db_offer:
-        raise HTTPException(status_code=404, detail="Offer not found")
-    db_offer.title = offer.title
-    db_offer.discount = offer.discount
-    db.commit()
-    db.refresh(db_offer)
-    return db_offer
-
-@app.delete("/offers/{offer_id}")
-def delete_offer(offer_id: int, db: Session = Depends(get_db)):
-    db_offer = db.query(Offer).filter(Offer.id == offer_id).first()
-    if not db_offer:
+async def get_offers(request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def render():
+        return offer_list.dump(await offer_list.fetch(db, offer_list.select())), {}
+    return await cached_response(request, db, "offers", render)
+
+@app.post("/offers", response_model=OfferOut, dependencies=[Depends(require_admin)])
+async def create_offer(offer: OfferBase, db: AsyncSession = Depends(get_db)):
+    row = await insert_row(db, Offer, offer.dict())
+    await db.commit()
+    # Expanded product responses embed offers and their final prices
+    catalog_cache.invalidate("offers", "products")
+    return row
+
+@app.put("/offers/{offer_id}", response_model=OfferOut, dependencies=[Depends(require_admin)])
+async def update_offer(offer_id: int, offer: OfferBase, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Offer, offer_id, offer.dict(), ("offers", "products"))
+
+@app.patch("/offers/{offer_id}", response_model=OfferOut, dependencies=[Depends(require_admin)])
+async def patch_offer(offer_id: int, offer: OfferPatch, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Offer, offer_id, offer.dict(exclude_unset=True), ("offers", "products"))
+
+@app.delete("/offers/{offer_id}", dependencies=[Depends(require_admin)])
+async def delete_offer(offer_id: int, db: AsyncSession = Depends(get_db)):
+    # Products on the offer lose it rather than pointing at a missing row
+    await db.execute(
+        update(Product).where(Product.offer_id == offer_id).values(offer_id=None)
+        .execution_options(synchronize_session=False)
+    )
+    if await delete_row(db, Offer, offer_id) is None:
         raise HTTPException(status_code=404, detail="Offer not found")
-    db.delete(db_offer)
-    db.commit()
+    await db.commit()
+    catalog_cache.invalidate("offers", "products")
     return {"detail": "Offer deleted"}
 
 
 # -------- PRODUCTS --------
-@app.get("/products", response_model=list[ProductOut])
-def get_products(db: Session = Depends(get_db)):
-    return db.query(Product).all()
-
-@app.post("/products", response_model=ProductOut)
-def create_product(product: ProductBase, db: Session = Depends(get_db)):
-    new_product = Product(**product.dict())
-    db.add(new_product)
-    db.commit()
-    db.refresh(new_product)
-    return new_product
-
-@app.put("/products/{product_id}", response_model=ProductOut)
-def update_product(product_id: int, product: ProductBase, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    for key, value in product.dict().items():
-        setattr(db_product, key, value)
-    db.commit()
-    db.refresh(db_product)
-    return db_product
-
-@app.delete("/products/{product_id}")
-def delete_product(product_id: int, db: Session = Depends(get_db)):
-    db_product = db.query(Product).filter(Product.id == product_id).first()
-    if not db_product:
+EXPANDABLE = {"category", "offer"}
+
+def parse_expand(expand: Optional[str]) -> set:
+    fields = {field.strip() for field in (expand or "").split(",") if field.strip()}
+    unknown = fields - EXPANDABLE
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Cannot expand: {', '.join(sorted(unknown))}")
+    return fields
+
+def expand_options(fields: set) -> list:
+    # Both are many-to-one, so joinedload adds LEFT JOINs to the page query
+    # instead of one lazy load per product. The offer is always needed for
+    # final_price.
+    return [
+        joinedload(Product.category) if "category" in fields else noload(Product.category),
+        joinedload(Product.offer),
+    ]
+
+# Keyset pagination: pass the X-Next-Cursor header of one page as ?cursor=
+# to get the next one. The cursor is only valid for the same sort order.
+# ?expand=category,offer inlines the related rows and the discounted
+# final_price, in the same single query.
+@app.get(
+    "/products",
+    response_model=Union[list[ProductDetailOut], list[ProductOut]],
+    dependencies=[Depends(catalog_limit)],
+)
+async def get_products(
+    request: Request,
+    category_id: Optional[int] = None,
+    offer_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: Literal["id", "price"] = "id",
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    expand: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    fields = parse_expand(expand)
+    return await cached_response(request, db, "products", lambda: render_products(
+        db, category_id, offer_id, min_price, max_price, sort, limit, cursor, fields
+    ))
+
+def page_products(query, category_id, offer_id, min_price, max_price, sort, cursor):
+    """Add the filters, keyset and order of one GET /products page to ``query``.
+
+    Each page walks one index in sort order and stops after the page: (price,
+    id) or (category_id/offer_id, price, id) when sorting by price, the
+    primary key or (category_id/offer_id, id) when sorting by id.
+    """
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    if offer_id is not None:
+        query = query.where(Product.offer_id == offer_id)
+    # Sorted by id, a price range is checked on the rows walked in id order.
+    # As an index key it would make the database read the whole range and
+    # sort it for every page; "price + 0" can't be one.
+    price = Product.price if sort == "price" else Product.price + 0
+    if min_price is not None:
+        query = query.where(price >= min_price)
+    if max_price is not None:
+        query = query.where(price <= max_price)
+
+    if sort == "price":
+        if cursor:
+            last_price, last_id = decode_cursor(cursor, is_number, is_int)
+            query = query.where(tuple_(Product.price, Product.id) > tuple_(last_price, last_id))
+        return query.order_by(Product.price, Product.id)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, is_int)
+        query = query.where(Product.id > last_id)
+    return query.order_by(Product.id)
+
+async def render_products(db, category_id, offer_id, min_price, max_price, sort, limit, cursor, expand):
+    if expand:
+        query = select(Product).options(*expand_options(expand))
+    else:
+        query = product_list.select()
+    query = page_products(query, category_id, offer_id, min_price, max_price, sort, cursor)
+    # Fetch one extra row to know whether another page exists
+    query = query.limit(limit + 1)
+    if expand:
+        products = (await db.scalars(query)).all()
+    else:
+        products = await product_list.fetch(db, query)
+    headers = {}
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        if sort == "price":
+            headers["X-Next-Cursor"] = encode_cursor(last.price, last.id)
+        else:
+            headers["X-Next-Cursor"] = encode_cursor(last.id)
+    if expand:
+        return dump_list(product_detail_list, products), headers
+    return product_list.dump(products), headers
+
+# Bulk import from an NDJSON or CSV request body (Content-Type: text/csv).
+# Rows carrying an id update that product, rows without one are inserted.
+@app.post("/products/bulk", dependencies=[Depends(require_admin)])
+async def bulk_import_products(request: Request, db: AsyncSession = Depends(get_db)):
+    if "csv" in request.headers.get("content-type", ""):
+        records = read_csv(request.stream())
+    else:
+        records = read_ndjson(request.stream())
+    stats = await import_products(db, records)
+    catalog_cache.invalidate("products")
+    return stats
+
+@app.get("/products/export", dependencies=[Depends(catalog_limit)])
+async def export_products_file(request: Request, format: Literal["ndjson", "csv"] = "ndjson"):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_products(format, primary=wrote_recently(request, READ_YOUR_WRITES_SECONDS)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="products.{format}"'},
+    )
+
+# Full-text search over title and description, best matches first, with a
+# highlighted snippet. Paged through X-Next-Cursor like the listings.
+@app.get(
+    "/products/search",
+    response_model=list[ProductSearchHit],
+    dependencies=[Depends(catalog_limit)],
+)
+async def search_products_endpoint(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def render():
+        (offset,) = decode_cursor(cursor, is_offset) if cursor else (0,)
+        hits = await search_products(db, q, limit + 1, offset)
+        headers = {}
+        if len(hits) > limit:
+            hits = hits[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(offset + limit)
+        return search_hit_list.dump_json(search_hit_list.validate_python(hits)), headers
+    return await cached_response(request, db, "products", render)
+
+@app.get(
+    "/products/{product_id}",
+    response_model=Union[ProductDetailOut, ProductOut],
+    dependencies=[Depends(catalog_limit)],
+)
+async def get_product(product_id: int, request: Request, expand: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    fields = parse_expand(expand)
+
+    async def render():
+        query = select(Product).where(Product.id == product_id)
+        if fields:
+            query = query.options(*expand_options(fields))
+        product = await db.scalar(query)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        if fields:
+            return product_detail.dump_json(product_detail.validate_python(product, from_attributes=True)), {}
+        return ProductOut.model_validate(product).model_dump_json().encode(), {}
+    return await cached_response(request, db, "products", render)
+
+@app.post("/products", response_model=ProductOut, dependencies=[Depends(require_admin)])
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_db)):
+    row = await insert_row(db, Product, product.dict())
+    await db.commit()
+    catalog_cache.invalidate("products")
+    return row
+
+@app.put("/products/{product_id}", response_model=ProductOut, dependencies=[Depends(require_admin)])
+async def update_product(product_id: int, product: ProductBase, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Product, product_id, product.dict(), ("products",))
+
+@app.patch("/products/{product_id}", response_model=ProductOut, dependencies=[Depends(require_admin)])
+async def patch_product(product_id: int, product: ProductPatch, db: AsyncSession = Depends(get_db)):
+    return await save_row(db, Product, product_id, product.dict(exclude_unset=True), ("products",))
+
+@app.delete("/products/{product_id}", dependencies=[Depends(require_admin)])
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_db)):
+    # Orders keep their product_id (NOT NULL) for history and analytics
+    ordered = select(Order.id).where(Order.product_id == product_id).exists()
+    if await delete_row(db, Product, product_id, ~ordered) is None:
+        if await exists(db, Product, product_id):
+            raise HTTPException(status_code=409, detail="Product has orders")
         raise HTTPException(status_code=404, detail="Product not found")
-    db.delete(db_product)
-    db.commit()
+    await db.commit()
+    catalog_cache.invalidate("products")
     return {"detail": "Product deleted"}
 
+# Stores the original and answers 202; the thumb/medium variants are made by
+# the "images.variants" job, which then points the product at them. Bodies
+# far over IMAGE_MAX_BYTES never get here (see BodyLimitMiddleware above).
+@app.post("/products/{product_id}/image", status_code=202, dependencies=[Depends(require_admin)])
+async def upload_product_image(product_id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_db)):
+    if images.Image is None:
+        raise HTTPException(status_code=503, detail="Image processing is not available")
+    if not await exists(db, Product, product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+    data = await file.read(IMAGE_MAX_BYTES + 1)
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Image larger than {IMAGE_MAX_BYTES} bytes")
+    try:
+        key, ext = await run_in_threadpool(store_original, data)
+    except ValueError as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+    enqueue(db, "images.variants", {"product_id": product_id, "key": key, "ext": ext})
+    await db.commit()
+    job_queue.wake()
+    urls = variant_urls(key)
+    return {"product_id": product_id, "key": key, "image_thumb": urls["thumb"], "image_medium": urls["medium"]}
+
 
 # -------- ORDERS --------
+# Newest first; keyset pagination through the X-Next-Cursor header as for
+# GET /products. Each filter is backed by an (column, id) index, and by a
+# (column, created_at, id) one for date ranges.
 @app.get("/orders", response_model=list[OrderOut])
-def get_orders(db: Session = Depends(get_db)):
-    return db.query(Order).all()
+async def get_orders(
+    user: Optional[str] = None,
+    status: Optional[str] = None,
+    product_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = page_orders(order_list.select(), user, status, product_id, created_from, created_to, cursor)
+    orders = await order_list.fetch(db, query.limit(limit + 1))
+    headers = {}
+    if len(orders) > limit:
+        orders = orders[:limit]
+        last = orders[-1]
+        if created_from is not None or created_to is not None:
+            headers["X-Next-Cursor"] = encode_cursor(last.created_at.isoformat(), last.id)
+        else:
+            headers["X-Next-Cursor"] = encode_cursor(last.id)
+    return Response(order_list.dump(orders), media_type="application/json", headers=headers)
 
-@app.post("/orders", response_model=OrderOut)
-def create_order(order: OrderBase, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == order.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    new_order = Order(**order.dict())
+def page_orders(query, user, status, product_id, created_from, created_to, cursor):
+    """Add the filters, keyset and order of one GET /orders page to ``query``.
+
+    Ordered by id, a date range would make the database read and sort every
+    order in it for each page. With one, pages go by (created_at, id) down
+    the matching index instead; ids and dates don't always agree (imports,
+    seeds), so the cursor then carries both.
+    """
+    if user is not None:
+        query = query.where(Order.user == user)
+    if status is not None:
+        query = query.where(Order.status == status)
+    if product_id is not None:
+        query = query.where(Order.product_id == product_id)
+    if created_from is None and created_to is None:
+        if cursor:
+            (last_id,) = decode_cursor(cursor, is_int)
+            query = query.where(Order.id < last_id)
+        return query.order_by(Order.id.desc())
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+    if cursor:
+        last_created_at, last_id = decode_cursor(cursor, is_timestamp, is_int)
+        last_created_at = datetime.fromisoformat(last_created_at)
+        query = query.where(tuple_(Order.created_at, Order.id) < tuple_(last_created_at, last_id))
+    return query.order_by(Order.created_at.desc(), Order.id.desc())
+
+CANCELLED = "Cancelled"
+
+def check_new_status(status: str):
+    # A new order always takes its stock; one created cancelled would hold
+    # units that neither a status change nor the delete would give back
+    if status == CANCELLED:
+        raise HTTPException(status_code=422, detail="Orders cannot be created cancelled")
+
+async def reserve_stock(db: AsyncSession, product_id: int, quantity: int):
+    """Take ``quantity`` units of a product in one conditional UPDATE.
+
+    The row lock taken by the UPDATE (the write lock on SQLite) is held until
+    the order transaction ends, so concurrent checkouts can't both pass the
+    stock check. Raises 404/409 if the product is missing or short. Returns
+    the product's (stock, price, category_id) after the update; a non-NULL
+    stock means cached listings went stale.
+    """
+    stmt = (
+        update(Product)
+        .where(Product.id == product_id, or_(Product.stock.is_(None), Product.stock >= quantity))
+        .values(stock=Product.stock - quantity)
+        .execution_options(synchronize_session=False)
+    )
+    reserved = (Product.stock, Product.price, Product.category_id)
+    if db.bind.dialect.update_returning:
+        row = (await db.execute(stmt.returning(*reserved))).first()
+        if row is not None:
+            return row
+    elif (await db.execute(stmt)).rowcount == 1:
+        return (await db.execute(select(*reserved).where(Product.id == product_id))).first()
+    if await db.scalar(select(Product.id).where(Product.id == product_id)) is None:
+        raise HTTPException(status_code=404, detail=f"Product {product_id} not found")
+    raise HTTPException(status_code=409, detail=f"Insufficient stock for product {product_id}")
+
+# optional_user first, so a token's user is the order limit's key
+@app.post("/orders", response_model=OrderOut, dependencies=[Depends(optional_user), Depends(order_limit)])
+async def create_order(order: OrderCreate, db: AsyncSession = Depends(get_db)):
+    check_new_status(order.status)
+    product = await reserve_stock(db, order.product_id, order.quantity)
+    new_order = Order(**order.dict(), unit_price=product.price, created_at=datetime.utcnow())
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    await record_order(db, new_order, category_id=product.category_id)
+    await db.commit()
+    if product.stock is not None:
+        catalog_cache.invalidate("products")
     return new_order
 
+# Place a whole cart in one transaction: either every line is reserved and
+# ordered, or nothing is.
+@app.post("/orders/batch", response_model=list[OrderOut], dependencies=[Depends(optional_user), Depends(order_limit)])
+async def create_order_batch(batch: OrderBatch, db: AsyncSession = Depends(get_db)):
+    check_new_status(batch.status)
+    quantities = {}
+    for line in batch.items:
+        quantities[line.product_id] = quantities.get(line.product_id, 0) + line.quantity
+    # Reserve in product id order so concurrent carts lock rows in the same
+    # order and can't deadlock each other
+    products = {}
+    for product_id in sorted(quantities):
+        products[product_id] = await reserve_stock(db, product_id, quantities[product_id])
+    stock_tracked = any(product.stock is not None for product in products.values())
+    placed_at = datetime.utcnow()
+    new_orders = [
+        Order(
+            product_id=line.product_id, quantity=line.quantity, user=batch.user, status=batch.status,
+            unit_price=products[line.product_id].price, created_at=placed_at,
+        )
+        for line in batch.items
+    ]
+    db.add_all(new_orders)
+    for new_order in new_orders:
+        await record_order(db, new_order, category_id=products[new_order.product_id].category_id)
+    await db.commit()
+    if stock_tracked:
+        catalog_cache.invalidate("products")
+    return new_orders
+
 # ✅ Fix: use JSON body for status updates
 class OrderStatusUpdate(BaseModel):
     status: str
 
-@app.patch("/orders/{order_id}", response_model=OrderOut)
-def update_order_status(order_id: int, update: OrderStatusUpdate, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if not db_order:
+class OrderBulkStatusUpdate(OrderStatusUpdate):
+    order_ids: list[int] = Field(min_length=1, max_length=1000)
+
+async def change_order_status(db: AsyncSession, order_ids: list, status: str):
+    """Set the status of some orders and enqueue the side effects.
+
+    Returns the orders found, and whether tracked stock was taken (so cached
+    listings went stale). Each UPDATE only matches rows still in the status
+    they were read with, so of two concurrent changes to an order only one
+    applies, and only the rows it changed get side effects. Reactivating a
+    cancelled order takes its stock again here (and may 409); everything
+    else (analytics, stock release on cancel, notifications) runs as jobs
+    after the commit.
+    """
+    orders = (await db.scalars(select(Order).where(Order.id.in_(order_ids)).with_for_update())).all()
+    current = {order.id: order.status for order in orders}
+    previous = {}
+    while True:
+        by_status = {}
+        for order_id, order_status in current.items():
+            if order_status != status and order_id not in previous:
+                by_status.setdefault(order_status, []).append(order_id)
+        if not by_status:
+            break
+        for old_status, ids in by_status.items():
+            matched = await update_ids(db, Order, ids, {"status": status}, Order.status == old_status)
+            previous.update(dict.fromkeys(matched, old_status))
+        # Rows another request changed in between. The UPDATEs above hold
+        # the write lock now, so their status can't move again before commit.
+        missed = [order_id for order_id, order_status in current.items() if order_status != status and order_id not in previous]
+        if not missed:
+            break
+        current.update((await db.execute(select(Order.id, Order.status).where(Order.id.in_(missed)))).all())
+
+    for order in orders:
+        set_committed_value(order, "status", status if order.id in previous else current[order.id])
+    changed = [order for order in orders if order.id in previous]
+    if not changed:
+        return orders, False
+
+    reactivated = {}
+    if status != CANCELLED:
+        for order in changed:
+            if previous[order.id] == CANCELLED:
+                reactivated[order.product_id] = reactivated.get(order.product_id, 0) + order.quantity
+    stock_taken = False
+    for product_id in sorted(reactivated):
+        product = await reserve_stock(db, product_id, reactivated[product_id])
+        stock_taken |= product.stock is not None
+
+    changes = [
+        {
+            "id": order.id, "user": order.user, "product_id": order.product_id, "quantity": order.quantity,
+            "unit_price": order.unit_price, "previous": previous[order.id],
+            "created_at": order.created_at.isoformat() if order.created_at else None,
+        }
+        for order in changed
+    ]
+    payload = {"status": status, "orders": changes}
+    enqueue(db, "orders.analytics", payload)
+    enqueue(db, "orders.notify", payload)
+    if status == CANCELLED:
+        enqueue(db, "orders.release_stock", payload)
+    return orders, stock_taken
+
+def after_status_change(stock_taken: bool):
+    job_queue.wake()
+    if stock_taken:
+        catalog_cache.invalidate("products")
+
+# Declared before /orders/{order_id} so "bulk" isn't parsed as an id
+@app.patch("/orders/bulk", dependencies=[Depends(require_admin)])
+async def update_order_status_bulk(body: OrderBulkStatusUpdate, db: AsyncSession = Depends(get_db)):
+    order_ids = sorted(set(body.order_ids))
+    orders, stock_taken = await change_order_status(db, order_ids, body.status)
+    await db.commit()
+    after_status_change(stock_taken)
+    found = {order.id for order in orders}
+    return {"updated": len(found), "not_found": [order_id for order_id in order_ids if order_id not in found]}
+
+# Status changes and deletes move stock and analytics totals, so like the
+# bulk variant they are admin-only
+@app.patch("/orders/{order_id}", response_model=OrderOut, dependencies=[Depends(require_admin)])
+async def update_order_status(order_id: int, update: OrderStatusUpdate, db: AsyncSession = Depends(get_db)):
+    orders, stock_taken = await change_order_status(db, [order_id], update.status)
+    if not orders:
         raise HTTPException(status_code=404, detail="Order not found")
-    db_order.status = update.status
-    db.commit()
-    db.refresh(db_order)
-    return db_order
-
-@app.delete("/orders/{order_id}")
-def delete_order(order_id: int, db: Session = Depends(get_db)):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
-    if not db_order:
+    await db.commit()
+    after_status_change(stock_taken)
+    # Every column is already loaded; no refresh round trip
+    return orders[0]
+
+@app.delete("/orders/{order_id}", dependencies=[Depends(require_admin)])
+async def delete_order(order_id: int, db: AsyncSession = Depends(get_db)):
+    row = await delete_row(db, Order, order_id)
+    if row is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    db.delete(db_order)
-    db.commit()
+    await record_order(db, Order(**row), sign=-1)
+    released = False
+    # A live order still holds its units; a cancelled one gave them back already
+    if row["status"] != CANCELLED:
+        released = (await db.execute(
+            update(Product)
+            .where(Product.id == row["product_id"], Product.stock.is_not(None))
+            .values(stock=Product.stock + row["quantity"])
+            .execution_options(synchronize_session=False)
+        )).rowcount > 0
+    await db.commit()
+    if released:
+        catalog_cache.invalidate("products")
     return {"detail": "Order deleted"}
 
 
+# -------- JOBS --------
+# Side effects of status changes, run by the workers in jobs.py after the
+# change commits. Each payload is {"status": new, "orders": [...]} as built
+# by change_order_status.
+job_queue = JobQueue(AsyncSessionLocal)
+notifications = logging.getLogger("notifications")
+
+def order_snapshot(change: dict, status: str) -> Order:
+    # Detached: only carries values for the analytics deltas, never flushed
+    created_at = datetime.fromisoformat(change["created_at"]) if change["created_at"] else None
+    return Order(
+        id=change["id"], product_id=change["product_id"], quantity=change["quantity"],
+        unit_price=change["unit_price"], created_at=created_at, user=change["user"], status=status,
+    )
+
+@job_queue.handler("orders.analytics")
+async def status_analytics_job(db: AsyncSession, payload: dict):
+    for change in payload["orders"]:
+        await record_status_change(db, order_snapshot(change, payload["status"]), change["previous"])
+
+@job_queue.handler("orders.release_stock")
+async def release_stock_job(db: AsyncSession, payload: dict):
+    quantities = {}
+    for change in payload["orders"]:
+        quantities[change["product_id"]] = quantities.get(change["product_id"], 0) + change["quantity"]
+    released = False
+    for product_id in sorted(quantities):
+        result = await db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.stock.is_not(None))
+            .values(stock=Product.stock + quantities[product_id])
+            .execution_options(synchronize_session=False)
+        )
+        released |= result.rowcount > 0
+    if released:
+        return lambda: catalog_cache.invalidate("products")
+
+@job_queue.handler("images.variants")
+async def image_variants_job(db: AsyncSession, payload: dict):
+    await image_pool.run(make_variants, payload["key"], payload["ext"])
+    urls = variant_urls(payload["key"])
+    await db.execute(
+        update(Product).where(Product.id == payload["product_id"])
+        # image too, so clients that only read it get the resized copy
+        .values(image=urls["medium"], image_thumb=urls["thumb"], image_medium=urls["medium"])
+        .execution_options(synchronize_session=False)
+    )
+    return lambda: catalog_cache.invalidate("products")
+
+@job_queue.handler("orders.notify")
+async def notify_job(db: AsyncSession, payload: dict):
+    # No mail or push provider is configured; this is where one would be called
+    for change in payload["orders"]:
+        notifications.info("Order %s for %s: %s -> %s", change["id"], change["user"], change["previous"], payload["status"])
+
+
+# -------- ANALYTICS --------
+# Read from the summary tables in analytics.py: one row per group, however
+# many orders there are.
+@app.get("/analytics/status", response_model=list[StatusTotalOut], dependencies=[Depends(require_admin)])
+async def status_breakdown(db: AsyncSession = Depends(get_read_db)):
+    rows = await db.execute(
+        select(OrderStatusTotal).where(OrderStatusTotal.orders != 0).order_by(OrderStatusTotal.status)
+    )
+    return rows.scalars().all()
+
+@app.get("/analytics/top-products", response_model=list[ProductSalesOut], dependencies=[Depends(require_admin)])
+async def top_products(
+    by: Literal["revenue", "units"] = "revenue",
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    column = ProductSales.revenue if by == "revenue" else ProductSales.units
+    query = (
+        select(ProductSales.product_id, Product.title, ProductSales.orders, ProductSales.units, ProductSales.revenue)
+        .outerjoin(Product, Product.id == ProductSales.product_id)
+        .where(ProductSales.orders > 0)
+        .order_by(column.desc(), ProductSales.product_id)
+        .limit(limit)
+    )
+    return (await db.execute(query)).mappings().all()
+
+@app.get("/analytics/revenue", response_model=list[CategoryRevenueOut], dependencies=[Depends(require_admin)])
+async def revenue_by_category(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    query = (
+        select(
+            CategoryDailySales.day, CategoryDailySales.category_id, Category.name.label("category"),
+            CategoryDailySales.orders, CategoryDailySales.units, CategoryDailySales.revenue,
+        )
+        .outerjoin(Category, Category.id == CategoryDailySales.category_id)
+        .where(CategoryDailySales.orders > 0)
+        .order_by(CategoryDailySales.day, CategoryDailySales.category_id)
+    )
+    if date_from is not None:
+        query = query.where(CategoryDailySales.day >= date_from)
+    if date_to is not None:
+        query = query.where(CategoryDailySales.day <= date_to)
+    if category_id is not None:
+        query = query.where(CategoryDailySales.category_id == category_id)
+    return (await db.execute(query)).mappings().all()
+
+
+# -------- CACHE --------
+@app.get("/cache/stats")
+async def cache_stats():
+    return catalog_cache.stats()
+
+@app.get("/auth/stats")
+async def auth_stats():
+    return hash_pool.stats()
+
+@app.get("/jobs/stats", dependencies=[Depends(require_admin)])
+async def jobs_stats():
+    return await job_queue.stats()
+
+
+# -------- METRICS --------
+cache_gauge = Gauge("catalog_cache", "Catalog response cache counters.")
+hash_pool_gauge = Gauge("auth_hash_pool", "Password hashing pool state.")
+
+def collect_component_stats():
+    for key, value in catalog_cache.stats().items():
+        if isinstance(value, (int, float)):
+            cache_gauge.set(value, stat=key)
+    for key, value in hash_pool.stats().items():
+        if isinstance(value, (int, float)):
+            hash_pool_gauge.set(value, stat=key)
+
+COLLECTORS.append(collect_component_stats)
+
+# Prometheus text exposition format
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Queue depth needs a query, which the synchronous collectors can't make
+    await job_queue.stats()
+    return render_metrics()
+
+
+# -------- MEDIA --------
+# Variant names embed the content hash, so they can be cached forever
+@app.get("/media/{filename}")
+async def media(filename: str):
+    path = media_path(filename)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not found")
+    return FileResponse(path, media_type="image/webp", headers={"Cache-Control": images.IMMUTABLE})
+
+
 # -------- ROOT --------
 @app.get("/")
-def root():
+async def root():
     return {"message": "Welcome to the eCommerce backend!"}
 
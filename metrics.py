@@ -0,0 +1,218 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from config import SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD
+
+logger = logging.getLogger("perf")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+# -------- REGISTRY --------
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+        REGISTRY.append(self)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[tuple(sorted(labels.items()))] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self.values.get(key)
+        if series is None:
+            series = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, (counts, total, count) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+REGISTRY = []
+# Called before rendering to refresh gauges read from other components
+COLLECTORS = []
+
+def render_metrics() -> str:
+    for collect in COLLECTORS:
+        collect()
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route, method and status.")
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route and method.")
+http_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served.")
+sql_latency = Histogram("db_statement_duration_seconds", "SQL statement execution time.", SQL_BUCKETS)
+sql_per_request = Histogram(
+    "db_statements_per_request", "SQL statements issued per HTTP request by route.",
+    (0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+sql_slow = Counter("db_slow_statements_total", "Statements slower than SLOW_QUERY_MS.")
+n_plus_one = Counter("db_n_plus_one_requests_total", "Requests issuing more than N_PLUS_ONE_THRESHOLD statements.")
+pool_wait = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", SQL_BUCKETS)
+pool_checked_out = Gauge("db_pool_checked_out", "Connections currently checked out of the pool.")
+
+
+# -------- PER-REQUEST SQL STATS --------
+class RequestStats:
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+# SQLAlchemy's asyncio greenlets inherit the calling task's context, so
+# engine events see the stats object of the request that issued the SQL
+current_request = ContextVar("current_request", default=None)
+
+
+def instrument_engine(engine, name: str = "primary"):
+    """Time statements, log slow ones, and time pool checkouts on a sync Engine
+    (pass ``async_engine.sync_engine`` for async engines)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        sql_latency.observe(elapsed, engine=name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_seconds += elapsed
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            sql_slow.inc(engine=name)
+            logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, name, " ".join(statement.split()))
+
+    # The pool has no "checkout started" event, so time the pool's own
+    # connect(); it is what the engine calls for every checkout. A pool
+    # replaced by engine.dispose() is no longer timed.
+    pool = engine.pool
+    pool_connect = pool.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        try:
+            return pool_connect()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, engine=name)
+
+    pool.connect = timed_connect
+
+    def collect_pool():
+        pool_checked_out.set(pool.checkedout() if hasattr(pool, "checkedout") else 0, engine=name)
+
+    COLLECTORS.append(collect_pool)
+
+
+
+# -------- MIDDLEWARE --------
+class MetricsMiddleware:
+    """Per-route latency, status and in-flight metrics, plus the N+1 check."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec()
+            current_request.reset(token)
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_requests.inc(route=route, method=method, status=status)
+            http_latency.observe(elapsed, route=route, method=method)
+            sql_per_request.observe(stats.statements, route=route)
+            if stats.statements > N_PLUS_ONE_THRESHOLD:
+                n_plus_one.inc(route=route)
+                logger.warning(
+                    "%s %s issued %d SQL statements (%.1f ms in SQL); possible N+1",
+                    method, route, stats.statements, stats.sql_seconds * 1000,
+                )
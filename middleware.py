@@ -0,0 +1,216 @@
+import re
+import time
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+LAST_WRITE_COOKIE = "last_write"
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """Brotli/gzip response compression above a size threshold.
+
+    Brotli is preferred when the client accepts it and the module is
+    installed. Single-chunk bodies are compressed whole (with a
+    Content-Length); streamed bodies are compressed chunk by chunk and
+    flushed so the stream keeps flowing.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, CompressingSender(self, encoding, send))
+
+
+class CompressingSender:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows whether to compress
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            if not self.should_compress(start, body, more_body):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.compressor = self.new_compressor()
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            # The encoded bytes differ from the identity body, so the tag is weak
+            if "etag" in headers and not headers["etag"].startswith("W/"):
+                headers["ETag"] = "W/" + headers["etag"]
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                body = self.finish(body)
+                headers["Content-Length"] = str(len(body))
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            await self.send(start)
+
+        if more_body:
+            data = self.flush(body)
+        else:
+            data = self.finish(body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    def should_compress(self, start, body: bytes, more_body: bool) -> bool:
+        status = start["status"]
+        if status < 200 or status in (204, 304):
+            return False
+        headers = Headers(raw=start["headers"])
+        if "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        return more_body or len(body) >= self.middleware.minimum_size
+
+    def new_compressor(self):
+        if self.encoding == "br":
+            return brotli.Compressor(quality=self.middleware.brotli_quality)
+        return zlib.compressobj(self.middleware.gzip_level, zlib.DEFLATED, 31)
+
+    def flush(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self.compressor.process(data) + self.compressor.finish()
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class LastWriteMiddleware:
+    """Stamp successful writes with a short-lived cookie holding their time.
+
+    get_read_db sends requests carrying a recent stamp to the primary, so a
+    client reads its own writes even while the replica lags. The cookie
+    lives in the client, so it works whichever worker serves the next read.
+    Paths in ``exempt`` (the auth endpoints) change nothing a GET reads.
+    """
+
+    def __init__(self, app, window: float, same_site: str = "none", exempt=()):
+        self.app = app
+        self.window = window
+        self.exempt = set(exempt)
+        # Browsers only accept SameSite=None together with Secure
+        attributes = "SameSite=None; Secure" if same_site.lower() == "none" else f"SameSite={same_site.capitalize()}"
+        self.attributes = f"Max-Age={max(1, round(window))}; Path=/; HttpOnly; {attributes}"
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or scope["method"] in SAFE_METHODS
+            or scope["path"] in self.exempt or self.window <= 0
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Set-Cookie", f"{LAST_WRITE_COOKIE}={time.time():.3f}; {self.attributes}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class BodyLimitMiddleware:
+    """413 for request bodies over a route's limit, before anything reads them.
+
+    Starlette parses a multipart form, spooling every file, before the
+    endpoint runs, so an endpoint can only check sizes after the whole
+    upload arrived. ``limits`` is a list of (method, path regex, max bytes)
+    checked against Content-Length instead. A limited route gets 411
+    without one, since a chunked body can't be measured unread; the server
+    rejects a body longer than its Content-Length.
+    """
+
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = [(method, re.compile(path), max_bytes) for method, path, max_bytes in limits]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for method, path, max_bytes in self.limits:
+                if scope["method"] == method and path.fullmatch(scope["path"]):
+                    response = self.check(Headers(scope=scope), max_bytes)
+                    if response is not None:
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def check(headers: Headers, max_bytes: int):
+        length = headers.get("content-length")
+        if length is None:
+            return JSONResponse({"detail": "Content-Length required"}, status_code=411)
+        if not length.isdigit():
+            return JSONResponse({"detail": "Invalid Content-Length"}, status_code=400)
+        if int(length) > max_bytes:
+            return JSONResponse({"detail": f"Request body larger than {max_bytes} bytes"}, status_code=413)
+        return None
+
+
+def wrote_recently(request, window: float) -> bool:
+    try:
+        return time.time() - float(request.cookies.get(LAST_WRITE_COOKIE, "")) < window
+    except ValueError:
+        return False
@@ -0,0 +1,132 @@
+"""Versioned schema migrations, applied before the app starts:
+
+    python migrations.py             # apply pending migrations
+    python migrations.py --status    # list applied and pending ones
+
+Each migration runs in its own transaction together with its row in
+schema_migrations. The app only checks the version at startup (see
+main.lifespan) instead of running DDL on import.
+
+Append new migrations to the end and never edit one that has shipped. A new
+database gets the current models from the baseline, so later migrations
+must tolerate objects that already exist (checkfirst / IF NOT EXISTS).
+"""
+import argparse
+import time
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, select, text
+
+from database import engine, Base, IS_SQLITE, create_tables, add_column
+from search import create_search_index, drop_search_index
+from analytics import rebuild as rebuild_analytics
+from models import Job, Order, Product
+
+metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+def migration(version: int, name: str):
+    def register(fn):
+        assert not MIGRATIONS or version > MIGRATIONS[-1][0], "migrations must be in version order"
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+@migration(1, "baseline schema")
+def baseline(conn):
+    # Databases created before migrations existed may lack newer columns and
+    # indexes; create_tables adds whatever is missing
+    create_tables(conn)
+
+@migration(2, "full-text search index")
+def search_index(conn):
+    create_search_index(conn)
+
+@migration(3, "backfill sales summaries")
+def sales_summaries(conn):
+    rebuild_analytics(conn)
+
+@migration(4, "job outbox")
+def job_outbox(conn):
+    Job.__table__.create(conn, checkfirst=True)
+
+@migration(5, "product image variants")
+def product_image_variants(conn):
+    add_column(conn, Product.__table__.c.image_thumb, checkfirst=True)
+    add_column(conn, Product.__table__.c.image_medium, checkfirst=True)
+
+@migration(6, "order date range indexes")
+def order_date_indexes(conn):
+    for index in Order.__table__.indexes:
+        if index.name.endswith("_created_at_id") and index.name != "ix_orders_created_at_id":
+            index.create(conn, checkfirst=True)
+
+
+# -------- RUNNER --------
+def applied_versions(conn) -> set:
+    if not conn.dialect.has_table(conn, schema_migrations.name):
+        return set()
+    return set(conn.scalars(select(schema_migrations.c.version)))
+
+def pending_migrations(conn) -> list:
+    applied = applied_versions(conn)
+    return [(version, name) for version, name, _ in MIGRATIONS if version not in applied]
+
+def migrate(bind=engine) -> list:
+    """Apply pending migrations in order; returns the (version, name) pairs applied."""
+    applied = []
+    with bind.connect() as conn:
+        if not IS_SQLITE:
+            # Serialize concurrent runs (several instances deploying at once)
+            conn.execute(text("SELECT pg_advisory_lock(hashtext('schema_migrations'))"))
+            conn.commit()
+        try:
+            metadata.create_all(conn)
+            conn.commit()
+            done = applied_versions(conn)
+            conn.commit()
+            for version, name, fn in MIGRATIONS:
+                if version in done:
+                    continue
+                with conn.begin():
+                    fn(conn)
+                    conn.execute(schema_migrations.insert().values(version=version, name=name))
+                applied.append((version, name))
+        finally:
+            if not IS_SQLITE:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext('schema_migrations'))"))
+                conn.commit()
+    return applied
+
+def reset(bind=engine):
+    """Drop every table, the search index and the migration history."""
+    with bind.begin() as conn:
+        drop_search_index(conn)
+        Base.metadata.drop_all(conn)
+        metadata.drop_all(conn)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database schema migrations.")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations only")
+    args = parser.parse_args()
+    if args.status:
+        with engine.connect() as conn:
+            pending = pending_migrations(conn)
+            current = max(applied_versions(conn), default=0)
+        print(f"Schema version {current}; {len(pending)} pending")
+        for version, name in pending:
+            print(f"  {version:>4}  {name}")
+    else:
+        started = time.perf_counter()
+        applied = migrate()
+        for version, name in applied:
+            print(f"Applied {version:>4}  {name}")
+        print(f"{len(applied)} migration(s) applied in {time.perf_counter() - started:.1f}s")
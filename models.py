@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from database import Base  # ✅ import Base only
 
@@ -36,11 +37,27 @@ class Product(Base):
     image = Column(String)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     offer_id = Column(Integer, ForeignKey("offers.id"), nullable=True)
+    # Units on hand; NULL means stock is not tracked for this product
+    stock = Column(Integer, nullable=True)
+    # URLs of the resized variants of an uploaded image (see images.py)
+    image_thumb = Column(String, nullable=True)
+    image_medium = Column(String, nullable=True)
 
     # Relationships
     category = relationship("Category", backref="products")
     offer = relationship("Offer", backref="products")
 
+    # Keyset pagination indexes: every filter + sort combination served by
+    # GET /products walks one of these (or the primary key) in sort order,
+    # with id as the tie-breaker. main.page_products picks which.
+    __table_args__ = (
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_category_id_id", "category_id", "id"),
+        Index("ix_products_category_price_id", "category_id", "price", "id"),
+        Index("ix_products_offer_id_id", "offer_id", "id"),
+        Index("ix_products_offer_price_id", "offer_id", "price", "id"),
+    )
+
 
 # --- ORDER MODEL ---
 class Order(Base):
@@ -50,6 +67,80 @@ class Order(Base):
     quantity = Column(Integer, nullable=False)
     user = Column(String, nullable=False)
     status = Column(String, default="Pending")
+    # UTC; NULL for orders placed before the column existed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Product price when the order was placed, so revenue doesn't move with
+    # later price changes; backfilled by analytics.rebuild for older orders
+    unit_price = Column(Float, nullable=True)
 
     # Relationship
     product = relationship("Product", backref="orders")
+
+    # GET /orders filters on one of these and pages newest first by id, or
+    # by (created_at, id) within a date range
+    __table_args__ = (
+        Index("ix_orders_user_id", "user", "id"),
+        Index("ix_orders_status_id", "status", "id"),
+        Index("ix_orders_product_id_id", "product_id", "id"),
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_created_at_id", "user", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_orders_product_id_created_at_id", "product_id", "created_at", "id"),
+    )
+
+
+# --- SALES SUMMARY MODELS ---
+# Maintained incrementally by the order handlers (see analytics.py) so
+# reports read one row per group instead of scanning orders.
+class OrderStatusTotal(Base):
+    __tablename__ = "order_status_totals"
+    status = Column(String, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# Revenue tables leave out cancelled orders
+class ProductSales(Base):
+    __tablename__ = "product_sales"
+    product_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+    # Top-N reports walk one of these backwards
+    __table_args__ = (
+        Index("ix_product_sales_revenue", "revenue"),
+        Index("ix_product_sales_units", "units"),
+    )
+
+
+class CategoryDailySales(Base):
+    __tablename__ = "category_daily_sales"
+    day = Column(Date, primary_key=True)
+    category_id = Column(Integer, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+
+# --- JOB MODEL ---
+# Outbox for side effects (see jobs.py): rows are written in the same
+# transaction as the change that causes them and deleted once handled.
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    # pending -> running -> deleted on success; failed after the last attempt
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # A running job whose worker died is picked up again after this
+    locked_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
@@ -0,0 +1,47 @@
+import base64
+import json
+import math
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+# Opaque keyset cursors: the sort key values of the last row on a page,
+# JSON encoded and base64'd so clients treat them as a token.
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+# Value checks for decode_cursor, one per position. Anything else (lists,
+# objects, null, bools, NaN, ints too big for a BIGINT) is a 400, not a
+# driver error.
+def is_int(value) -> bool:
+    return type(value) is int and -2**63 <= value < 2**63
+
+def is_number(value) -> bool:
+    return is_int(value) or (type(value) is float and math.isfinite(value))
+
+def is_offset(value) -> bool:
+    return is_int(value) and value >= 0
+
+def is_timestamp(value) -> bool:
+    if type(value) is not str:
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+def decode_cursor(cursor: str, *checks):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if (
+        not isinstance(values, list) or len(values) != len(checks)
+        or not all(check(value) for check, value in zip(checks, values))
+    ):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
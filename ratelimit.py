@@ -0,0 +1,241 @@
+"""Token-bucket rate limits per route, and a global concurrency cap.
+
+Limits are FastAPI dependencies keyed by client IP, by the user of a
+verified token, or (login only) by the account named in the body:
+
+    login_limit = RateLimit("login-ip", LOGIN_IP_RATE)
+    @app.post("/login", dependencies=[Depends(login_limit)])
+
+A request over its limit gets 429 with Retry-After. Buckets live in a
+BucketStore: MemoryStore is per process, SQLiteStore is shared by every
+process that opens the same file.
+"""
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from config import RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH
+from metrics import Counter
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+rate_limited = Counter("http_rate_limited_total", "Requests rejected with 429 by rate limit.")
+requests_shed = Counter("http_requests_shed_total", "Requests rejected with 503 by the concurrency cap.")
+
+
+def parse_rate(rate: str):
+    """"10/minute" -> (10, 60.0): requests allowed per period in seconds."""
+    try:
+        count, period = rate.split("/")
+        return int(count), float(PERIODS[period.strip()])
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate {rate!r}, expected e.g. '10/minute'") from None
+
+def take_token(tokens: float, updated: float, now: float, rate: float, burst: int, cost: int):
+    """Refill a bucket and try to take ``cost`` tokens from it.
+
+    Returns (tokens left, seconds to wait); the wait is 0 when allowed.
+    """
+    tokens = min(burst, tokens + (now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+# -------- STORES --------
+class MemoryStore:
+    """Buckets in a per-process LRU dict."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens, wait = take_token(tokens, updated, now, rate, burst, cost)
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            # Least recently seen; an evicted client just starts with a full bucket
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class SQLiteStore:
+    """Buckets in a SQLite table, so every worker on the host shares them.
+
+    Each take is one short IMMEDIATE transaction; callers run it in a
+    thread. A stand-in for a network store such as Redis.
+    """
+
+    blocking = True
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        conn = self.connect()
+        # Wall clock: monotonic clocks aren't comparable across processes
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens, wait = take_token(tokens, updated, now, rate, burst, cost)
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                # Idle for an hour means refilled under any configured rate
+                conn.execute("DELETE FROM rate_limit_buckets WHERE updated < ?", (now - PERIODS["hour"],))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+
+def create_store(backend: str):
+    if backend == "memory":
+        return MemoryStore()
+    if backend == "sqlite":
+        return SQLiteStore(RATE_LIMIT_SQLITE_PATH)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {backend!r}")
+
+store = create_store(RATE_LIMIT_BACKEND)
+
+
+# -------- LIMITS --------
+def client_ip(request: Request) -> str:
+    # uvicorn only rewrites this from X-Forwarded-For for the addresses in
+    # --forwarded-allow-ips (FORWARDED_ALLOW_IPS), 127.0.0.1 by default.
+    # Behind another proxy, allow it, or every client shares one bucket.
+    return request.client.host if request.client else "unknown"
+
+async def client_address(request: Request) -> str:
+    return f"ip:{client_ip(request)}"
+
+async def client_user(request: Request) -> str:
+    """The user a verified token named, else the IP.
+
+    Routes set request.state.user by depending on tokens.optional_user ahead
+    of the limit. Names sent in the body are never trusted here: anyone
+    could use them to dodge their own limit or drain someone else's.
+    """
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return f"user:{getattr(user, 'username', user)}"
+    return f"ip:{client_ip(request)}"
+
+async def login_username(request: Request) -> str:
+    """The account a login attempt targets, from its JSON body, else the IP.
+
+    Only for the login route, where the point is to slow down guessing one
+    account's password from many addresses.
+    """
+    if request.headers.get("content-type", "").startswith("application/json"):
+        try:
+            body = await request.json()  # cached; FastAPI parses the same body
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and isinstance(body.get("username"), str):
+            return f"username:{body['username']}"
+    return f"ip:{client_ip(request)}"
+
+KEYS = {"ip": client_address, "user": client_user, "username": login_username}
+
+
+class RateLimit:
+    """Dependency allowing ``rate`` requests per client, keyed by "ip",
+    "user" (verified token, else IP) or "username" (login body)."""
+
+    def __init__(self, name: str, rate: str, key: str = "ip", store=None):
+        if key not in KEYS:
+            raise ValueError(f"Unknown rate limit key {key!r}")
+        count, period = parse_rate(rate)
+        self.name = name
+        self.burst = count
+        self.rate = count / period
+        self.key = key
+        self.store = store
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+        identity = await KEYS[self.key](request)
+        bucket_store = self.store or store
+        bucket = f"{self.name}:{identity}"
+        if bucket_store.blocking:
+            wait = await run_in_threadpool(bucket_store.take, bucket, self.rate, self.burst)
+        else:
+            wait = bucket_store.take(bucket, self.rate, self.burst)
+        if wait:
+            rate_limited.inc(limit=self.name)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+
+# -------- ADMISSION CONTROL --------
+class AdmissionMiddleware:
+    """Cap requests in progress; shed the excess with 503 instead of queuing.
+
+    A request that finds every slot taken waits up to ``timeout`` seconds
+    for one, then gets 503 with Retry-After. Paths in ``exempt`` (health
+    checks, metrics) are always admitted.
+    """
+
+    def __init__(self, app, max_concurrent: int = 100, timeout: float = 0.5, exempt=("/", "/metrics")):
+        self.app = app
+        self.timeout = timeout
+        self.exempt = set(exempt)
+        self.slots = asyncio.Semaphore(max_concurrent)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+        if self.slots.locked():
+            try:
+                await asyncio.wait_for(self.slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                requests_shed.inc()
+                response = JSONResponse({"detail": "Server busy"}, status_code=503, headers={"Retry-After": "1"})
+                await response(scope, receive, send)
+                return
+        else:
+            await self.slots.acquire()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.slots.release()
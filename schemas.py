@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import date, datetime
+from pydantic import BaseModel, Field, computed_field
 from typing import Optional
 
 # === USER SCHEMAS ===
@@ -11,6 +12,9 @@ class UserCreate(BaseModel):
     password: str
     role: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class UserOut(BaseModel):
     id: int
     username: str
@@ -30,6 +34,11 @@ class CategoryOut(CategoryBase):
     class Config:
         from_attributes = True
 
+# PATCH bodies: only the fields sent are written (model_dump(exclude_unset=True)).
+# Fields typed without Optional may be omitted but not set to null.
+class CategoryPatch(BaseModel):
+    name: str = None
+
 
 # === OFFER SCHEMAS ===
 class OfferBase(BaseModel):
@@ -42,6 +51,10 @@ class OfferOut(OfferBase):
     class Config:
         from_attributes = True
 
+class OfferPatch(BaseModel):
+    title: str = None
+    discount: float = None
+
 
 # === PRODUCT SCHEMAS ===
 class ProductBase(BaseModel):
@@ -52,12 +65,49 @@ class ProductBase(BaseModel):
     category_id: int
     offer_id: Optional[int] = None
 
+# Units on hand; None means not tracked. Only set on create and by PATCH:
+# a full PUT or re-import that left it out would switch tracking off, and a
+# stale value would undo reservations made since it was read.
+class ProductCreate(ProductBase):
+    stock: Optional[int] = Field(None, ge=0)
+
 class ProductOut(ProductBase):
     id: int
+    stock: Optional[int] = None
+    # Set by POST /products/{id}/image once the variants are ready
+    image_thumb: Optional[str] = None
+    image_medium: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+class ProductPatch(BaseModel):
+    title: str = None
+    price: float = None
+    description: Optional[str] = None
+    image: Optional[str] = None
+    category_id: int = None
+    offer_id: Optional[int] = None
+    stock: Optional[int] = Field(None, ge=0)
+
+
+# Product with its category and offer inlined (GET /products?expand=...)
+class ProductDetailOut(ProductOut):
+    category: Optional[CategoryOut] = None
+    offer: Optional[OfferOut] = None
+
+    @computed_field
+    @property
+    def final_price(self) -> float:
+        if self.offer is None:
+            return self.price
+        return round(self.price * (1 - self.offer.discount / 100), 2)
+
+
+class ProductSearchHit(ProductOut):
+    rank: float
+    snippet: Optional[str] = None
+
 
 # === ORDER SCHEMAS ===
 class OrderBase(BaseModel):
@@ -66,8 +116,41 @@ class OrderBase(BaseModel):
     user: str
     status: str
 
+class OrderCreate(OrderBase):
+    quantity: int = Field(gt=0)
+
 class OrderOut(OrderBase):
     id: int
+    created_at: Optional[datetime] = None
+    unit_price: Optional[float] = None
 
     class Config:
         from_attributes = True
+
+class OrderLine(BaseModel):
+    product_id: int
+    quantity: int = Field(gt=0)
+
+class OrderBatch(BaseModel):
+    user: str
+    status: str = "Pending"
+    items: list[OrderLine] = Field(min_length=1)
+
+
+# --- ANALYTICS ---
+class SalesTotals(BaseModel):
+    orders: int
+    units: int
+    revenue: float
+
+class StatusTotalOut(SalesTotals):
+    status: str
+
+class ProductSalesOut(SalesTotals):
+    product_id: int
+    title: Optional[str] = None
+
+class CategoryRevenueOut(SalesTotals):
+    day: date
+    category_id: int
+    category: Optional[str] = None
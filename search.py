@@ -0,0 +1,96 @@
+import re
+
+from sqlalchemy import text
+
+from database import IS_SQLITE
+from models import Product
+
+# SQLite: an external-content FTS5 table over products.title/description.
+# Triggers keep it in sync with every write path (handlers, bulk import,
+# seeding), so no caller has to remember to update it.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, description, content='products', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+# Postgres: a generated tsvector column (title weighted above description)
+# with a GIN index; the database maintains it on every write.
+POSTGRES_SCHEMA = [
+    """ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+COLUMNS = ", ".join(f"p.{column.name}" for column in Product.__table__.columns)
+
+# bm25() is lower-is-better; negate it so rank sorts high to low on both backends
+SQLITE_QUERY = f"""
+    SELECT {COLUMNS},
+        -bm25(products_fts, 10.0, 1.0) AS rank,
+        snippet(products_fts, -1, '<mark>', '</mark>', '…', 12) AS snippet
+    FROM products_fts JOIN products p ON p.id = products_fts.rowid
+    WHERE products_fts MATCH :query
+    ORDER BY bm25(products_fts, 10.0, 1.0), p.id
+    LIMIT :limit OFFSET :offset
+"""
+
+# Rank and page first, then build headlines for the page rows only
+POSTGRES_QUERY = f"""
+    SELECT {COLUMNS}, hits.rank,
+        ts_headline('english', coalesce(p.description, p.title), hits.query,
+                    'StartSel=<mark>, StopSel=</mark>, MaxWords=20, MinWords=8') AS snippet
+    FROM (
+        SELECT products.id, ts_rank(search_vector, query) AS rank, query
+        FROM products, websearch_to_tsquery('english', :query) query
+        WHERE search_vector @@ query
+        ORDER BY rank DESC, products.id
+        LIMIT :limit OFFSET :offset
+    ) hits JOIN products p ON p.id = hits.id
+    ORDER BY hits.rank DESC, p.id
+"""
+
+
+def create_search_index(conn):
+    if IS_SQLITE:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")).first()
+        for stmt in SQLITE_SCHEMA:
+            conn.execute(text(stmt))
+        if not exists:
+            # Index the products that predate the FTS table
+            conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+    else:
+        for stmt in POSTGRES_SCHEMA:
+            conn.execute(text(stmt))
+
+def drop_search_index(conn):
+    # Dropping products drops the triggers but not the FTS table itself
+    if IS_SQLITE:
+        conn.execute(text("DROP TABLE IF EXISTS products_fts"))
+
+def fts5_query(q: str) -> str:
+    # Match every word as a prefix; quoting keeps FTS5 operators and
+    # punctuation in user input from being parsed as query syntax
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q))
+
+async def search_products(db, q: str, limit: int, offset: int) -> list:
+    if IS_SQLITE:
+        query = fts5_query(q)
+        if not query:
+            return []
+        result = await db.execute(text(SQLITE_QUERY), {"query": query, "limit": limit, "offset": offset})
+    else:
+        result = await db.execute(text(POSTGRES_QUERY), {"query": q, "limit": limit, "offset": offset})
+    return result.mappings().all()
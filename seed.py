@@ -1,66 +1,46 @@
-from sqlalchemy.orm import Session
-from database import engine, Base, SessionLocal
-from models import User, Category, Product, Offer
-from auth import hash_password
-
-from database import Base, engine
-
-# Drop all existing tables
-Base.metadata.drop_all(bind=engine)
+"""Seed the database: demo catalog, a products JSON file, or synthetic data.
 
-# Recreate tables according to current models
-Base.metadata.create_all(bind=engine)
+    python seed.py                        # demo users, categories, offers, products
+    python seed.py --reset                # drop and recreate all tables first
+    python seed.py --from-json products.json
+    python seed.py --synthetic --products 100000 --orders 1000000 --seed 42
 
+Every step is a set-based upsert, so re-running only adds what is missing.
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import func, insert, select
+from database import engine, dialect_insert
+from migrations import migrate, reset
+from analytics import rebuild as rebuild_analytics
+from models import User, Category, Product, Offer, Order
+from auth import hash_password
 
-# Start session
-db = SessionLocal()
+BATCH_SIZE = 10000
 
 # -----------------------------
-# Users
+# Demo data
 # -----------------------------
-users_data = [
+DEMO_USERS = [
     {"username": "admin@123", "password": "admin123", "role": "admin"},
     {"username": "john@1", "password": "john123", "role": "user"}
 ]
 
-for u in users_data:
-    user = User(username=u["username"], password=hash_password(u["password"]), role=u["role"])
-    db.add(user)
-
-# -----------------------------
-# Categories
-# -----------------------------
-categories_data = [
-    "Clothing", "Electronics", "Wearables", "Smart Home", 
+DEMO_CATEGORIES = [
+    "Clothing", "Electronics", "Wearables", "Smart Home",
     "Audio", "Gaming", "Accessories"
 ]
 
-categories = {}
-for name in categories_data:
-    cat = Category(name=name)
-    db.add(cat)
-    db.flush()  # Get ID immediately
-    categories[name] = cat.id
-
-# -----------------------------
-# Offers
-# -----------------------------
-offers_data = [
+DEMO_OFFERS = [
     {"title": "50% Off", "discount": 50},
     {"title": "30% Off", "discount": 30},
 ]
 
-offers = {}
-for o in offers_data:
-    offer = Offer(title=o["title"], discount=o["discount"])
-    db.add(offer)
-    db.flush()
-    offers[o["title"]] = offer.id
-
-# -----------------------------
-# Products
-# -----------------------------
-products_data = [
+DEMO_PRODUCTS = [
     # Electronics
     {
         "title": "Smartphone Max 12",
@@ -188,20 +168,186 @@ products_data = [
     }
 ]
 
-# Add products
-for p in products_data:
-    prod = Product(
-        title=p["title"],
-        price=p["price"],
-        description=p["description"],
-        image=p["image"],
-        category_id=categories[p["category"]],
-        offer_id=None  # default no offer
+
+ORDER_STATUSES = ["Pending", "Shipped", "Delivered", "Cancelled"]
+SYNTHETIC_USER_PREFIX = "loadtest"
+
+
+def batches(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def insert_ignoring_conflicts(conn, model, rows, key):
+    # INSERT ... ON CONFLICT (key) DO NOTHING; needs a unique index on key
+    stmt = dialect_insert(model).on_conflict_do_nothing(index_elements=[key])
+    for batch in batches(rows):
+        conn.execute(stmt, batch)
+
+def insert_missing(conn, model, rows, key):
+    # For tables without a unique key: one query for the existing keys,
+    # then a bulk insert of the rest
+    existing = set(conn.scalars(select(getattr(model, key))))
+    missing = [row for row in rows if row[key] not in existing]
+    for batch in batches(missing):
+        conn.execute(insert(model), batch)
+    return len(missing)
+
+
+# -----------------------------
+# Users
+# -----------------------------
+def seed_users(conn, users, workers):
+    existing = set(conn.scalars(select(User.username)))
+    missing = [u for u in users if u["username"] not in existing]
+    # bcrypt dominates seeding time; spread it over all cores
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashes = pool.map(hash_password, [u["password"] for u in missing], chunksize=16)
+        rows = [
+            {"username": u["username"], "password": hashed, "role": u["role"]}
+            for u, hashed in zip(missing, hashes)
+        ]
+    insert_ignoring_conflicts(conn, User, rows, "username")
+    return len(rows)
+
+
+# -----------------------------
+# Categories, offers, products
+# -----------------------------
+def seed_catalog(conn, categories, products, offers):
+    names = dict.fromkeys(categories + [p["category"] for p in products])
+    insert_ignoring_conflicts(conn, Category, [{"name": name} for name in names], "name")
+    categories = dict(conn.execute(select(Category.name, Category.id)).all())
+
+    added_offers = insert_missing(conn, Offer, offers, "title")
+    offer_ids = dict(conn.execute(select(Offer.title, Offer.id)).all())
+
+    rows = [
+        {
+            "title": p["title"],
+            "price": p["price"],
+            "description": p.get("description"),
+            "image": p.get("image"),
+            "category_id": categories[p["category"]],
+            "offer_id": offer_ids.get(p.get("offer")),
+            "stock": p.get("stock"),
+        }
+        for p in products
+    ]
+    added_products = insert_missing(conn, Product, rows, "title")
+    return len(categories), added_offers, added_products
+
+
+# -----------------------------
+# Synthetic data
+# -----------------------------
+def synthetic_users(count):
+    return [
+        {"username": f"{SYNTHETIC_USER_PREFIX}{i:06d}", "password": f"{SYNTHETIC_USER_PREFIX}{i:06d}", "role": "user"}
+        for i in range(count)
+    ]
+
+def synthetic_offers(count, rng):
+    return [{"title": f"Synthetic offer {i:03d}", "discount": rng.choice([5, 10, 15, 20, 25, 50])} for i in range(count)]
+
+def synthetic_products(count, categories, offers, rng):
+    return [
+        {
+            "title": f"Synthetic product {i:07d}",
+            "price": round(rng.uniform(1, 2000), 2),
+            "description": f"Synthetic product number {i} for load testing.",
+            "image": None,
+            "category": f"Synthetic category {rng.randrange(categories):04d}",
+            "offer": f"Synthetic offer {rng.randrange(offers):03d}" if offers and rng.random() < 0.2 else None,
+            "stock": rng.randint(0, 1000),
+        }
+        for i in range(count)
+    ]
+
+def seed_synthetic_orders(conn, count, users, rng):
+    # Orders have no natural key: count the synthetic ones already there and
+    # generate only the tail of the same seeded sequence
+    existing = conn.scalar(
+        select(func.count()).select_from(Order).where(Order.user.like(f"{SYNTHETIC_USER_PREFIX}%"))
+    )
+    product_ids = list(conn.scalars(select(Product.id)))
+    if not product_ids or not users or existing >= count:
+        return 0
+    # Spread over the last 90 days so date-range queries have data to cut
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=90)
+    rows = []
+    for i in range(count):
+        row = {
+            "product_id": rng.choice(product_ids),
+            "quantity": rng.randint(1, 5),
+            "user": f"{SYNTHETIC_USER_PREFIX}{rng.randrange(users):06d}",
+            "status": rng.choice(ORDER_STATUSES),
+            "created_at": start + timedelta(seconds=rng.randrange(90 * 86400)),
+        }
+        if i >= existing:
+            rows.append(row)
+        if len(rows) >= BATCH_SIZE:
+            conn.execute(insert(Order), rows)
+            rows = []
+    if rows:
+        conn.execute(insert(Order), rows)
+    return count - existing
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the eCommerce database.")
+    parser.add_argument("--reset", action="store_true", help="drop and recreate all tables first")
+    parser.add_argument("--from-json", metavar="PATH", help="load products from a JSON file instead of the demo catalog")
+    parser.add_argument("--no-demo", action="store_true", help="skip the demo users, offers and catalog")
+    parser.add_argument("--synthetic", action="store_true", help="generate synthetic load-test data")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--offers", type=int, default=10)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for synthetic data")
+    parser.add_argument("--workers", type=int, default=None, help="processes used for bcrypt")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+
+    if args.reset:
+        reset()
+    migrate()
+
+    users, categories, offers, products = [], [], [], []
+    if not args.no_demo:
+        users += DEMO_USERS
+        categories += DEMO_CATEGORIES
+        offers += DEMO_OFFERS
+        if args.from_json:
+            with open(args.from_json, "r") as f:
+                products += json.load(f)
+        else:
+            products += DEMO_PRODUCTS
+
+    rng = random.Random(args.seed)
+    if args.synthetic:
+        users += synthetic_users(args.users)
+        offers += synthetic_offers(args.offers, rng)
+        products += synthetic_products(args.products, args.categories, args.offers, rng)
+
+    # One transaction for the whole run
+    with engine.begin() as conn:
+        added_users = seed_users(conn, users, args.workers)
+        categories, added_offers, added_products = seed_catalog(conn, categories, products, offers)
+        added_orders = seed_synthetic_orders(conn, args.orders, args.users, rng) if args.synthetic else 0
+        # Bulk-inserted orders bypass the handlers that keep the summaries current
+        if added_orders:
+            rebuild_analytics(conn)
+
+    print(
+        f"Seeded in {time.perf_counter() - started:.1f}s: {added_users} users, "
+        f"{categories} categories, {added_offers} offers, {added_products} products, "
+        f"{added_orders} orders added"
     )
-    db.add(prod)
 
-# Commit everything
-db.commit()
-db.close()
 
-print("Database wiped and fully seeded with users, categories, offers, and products!")
+if __name__ == "__main__":
+    main()
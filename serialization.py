@@ -0,0 +1,51 @@
+import json
+from datetime import date
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from config import FAST_JSON
+
+try:
+    import orjson
+except ImportError:  # optional: only speeds up FAST_JSON
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dump_rows(rows) -> bytes:
+    """Encode Core result rows as a JSON array of objects."""
+    records = [row._asdict() for row in rows]
+    if orjson is not None:
+        return orjson.dumps(records)
+    return json.dumps(records, default=_default, separators=(",", ":")).encode()
+
+
+class ListRenderer:
+    """Query and render the rows of a list endpoint for one model/schema pair.
+
+    By default rows are ORM objects validated through the response schema.
+    With FAST_JSON they are plain tuples of exactly the schema's columns,
+    encoded directly: no identity map, no per-object hydration or validation.
+    """
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.adapter = TypeAdapter(list[schema])
+        self.columns = [model.__table__.c[name] for name in schema.model_fields]
+
+    def select(self):
+        return select(*self.columns) if FAST_JSON else select(self.model)
+
+    async def fetch(self, db, query) -> list:
+        result = await db.execute(query)
+        return result.all() if FAST_JSON else result.scalars().all()
+
+    def dump(self, rows) -> bytes:
+        if FAST_JSON:
+            return dump_rows(rows)
+        return self.adapter.dump_json(self.adapter.validate_python(rows, from_attributes=True))
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+# Settings are read once at import, so point everything at a scratch
+# directory before any app module is imported
+_workdir = tempfile.mkdtemp(prefix="ecommerce-tests-")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{_workdir}/test.db",
+    SECRET_KEY="test-secret",
+    RATE_LIMIT_ENABLED="false",
+    WARMUP="false",
+    CACHE_BUS="local",
+    MEDIA_ROOT=os.path.join(_workdir, "media"),
+)
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("WEB_CONCURRENCY", None)
+
+import migrations  # noqa: E402
+
+migrations.migrate()
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from tokens import issue_tokens  # noqa: E402
+
+ADMIN = {"Authorization": "Bearer " + issue_tokens("admin@test", "admin")["access_token"]}
+
+
+def run_with_client(test):
+    """Run ``await test(client)`` against the app, with its lifespan (job workers) running."""
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                await test(client)
+    asyncio.run(run())
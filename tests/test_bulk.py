@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from bulk import read_csv
+from conftest import ADMIN, run_with_client
+
+
+def parse_csv(*chunks: bytes) -> list:
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def run():
+        return [record async for record in read_csv(stream())]
+    return asyncio.run(run())
+
+
+def test_plain_rows_and_empty_cells():
+    assert parse_csv(b"title,price,description\nLamp,20,\nDesk,90,Oak\n") == [
+        (2, {"title": "Lamp", "price": "20", "description": None}),
+        (3, {"title": "Desk", "price": "90", "description": "Oak"}),
+    ]
+
+def test_quoted_fields_may_span_lines_and_chunks():
+    records = parse_csv(b'title,description\nLamp,"Brass\n', b'and glass, ""vintage"""\nDesk,"Oak"\n')
+    assert records == [
+        (2, {"title": "Lamp", "description": 'Brass\nand glass, "vintage"'}),
+        (4, {"title": "Desk", "description": "Oak"}),
+    ]
+
+def test_crlf_and_no_final_newline():
+    assert parse_csv(b'title,description\r\nLamp,"a\r\nb"\r\nDesk,x') == [
+        (2, {"title": "Lamp", "description": "a\r\nb"}),
+        (4, {"title": "Desk", "description": "x"}),
+    ]
+
+def test_unclosed_quote_is_a_422():
+    with pytest.raises(HTTPException) as error:
+        parse_csv(b'title,description\nLamp,ok\nDesk,"never closed\nChair,1\n')
+    assert error.value.status_code == 422
+    assert error.value.detail.startswith("Line 3:")
+
+
+def test_import_rejects_an_unclosed_quote():
+    async def test(client):
+        body = b'title,price,category_id\n"Broken,1,1\nFine,2,1\n'
+        response = await client.post("/products/bulk", content=body, headers={**ADMIN, "Content-Type": "text/csv"})
+        assert response.status_code == 422
+        assert "not closed" in response.json()["detail"]
+    run_with_client(test)
@@ -0,0 +1,70 @@
+import uuid
+
+import main
+from bus import LocalBus
+from cache import ResponseCache
+from conftest import ADMIN, run_with_client
+
+
+def test_writes_invalidate_cached_listings():
+    async def test(client):
+        first = await client.get("/categories")
+        hits = main.catalog_cache.stats()["hits"]
+        again = await client.get("/categories")
+        assert again.content == first.content
+        assert main.catalog_cache.stats()["hits"] == hits + 1
+
+        name = f"Cache {uuid.uuid4().hex}"
+        created = await client.post("/categories", json={"name": name}, headers=ADMIN)
+        after = await client.get("/categories")
+        assert name in [category["name"] for category in after.json()]
+        assert after.headers["etag"] != first.headers["etag"]
+
+        await client.patch(f"/categories/{created.json()['id']}", json={"name": name + " 2"}, headers=ADMIN)
+        assert name + " 2" in [category["name"] for category in (await client.get("/categories")).json()]
+    run_with_client(test)
+
+
+def test_read_that_raced_a_write_is_not_cached():
+    cache = ResponseCache(max_entries=10, ttl=60, bus=LocalBus())
+    generation, _, _ = cache.validators("products")
+    # A write commits while the read is still rendering its body
+    cache.invalidate("products")
+    entry = cache.set("products", "/products?", b"stale", {}, generation)
+    assert entry.body == b"stale"
+    assert cache.get("products", "/products?") is None
+
+    generation, _, _ = cache.validators("products")
+    cache.set("products", "/products?", b"fresh", {}, generation)
+    assert cache.get("products", "/products?").body == b"fresh"
+
+def test_invalidation_only_drops_its_namespace():
+    cache = ResponseCache(max_entries=10, ttl=60, bus=LocalBus())
+    for namespace in ("products", "offers"):
+        cache.set(namespace, "/", namespace.encode(), {}, cache.validators(namespace)[0])
+    cache.invalidate("products")
+    assert cache.get("products", "/") is None
+    assert cache.get("offers", "/").body == b"offers"
+
+
+def test_conditional_gets_answer_304_until_a_write():
+    async def test(client):
+        first = await client.get("/offers")
+        etag, last_modified = first.headers["etag"], first.headers["last-modified"]
+
+        for headers in ({"If-None-Match": etag}, {"If-None-Match": "W/" + etag}, {"If-Modified-Since": last_modified}):
+            response = await client.get("/offers", headers=headers)
+            assert response.status_code == 304
+            assert response.content == b""
+            assert response.headers["etag"] == etag
+        # If-None-Match wins over a matching If-Modified-Since
+        response = await client.get("/offers", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+        assert response.status_code == 200
+        response = await client.get("/offers", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"})
+        assert response.status_code == 200
+
+        await client.post("/offers", json={"title": f"Cache {uuid.uuid4().hex}", "discount": 10}, headers=ADMIN)
+        response = await client.get("/offers", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+    run_with_client(test)
@@ -0,0 +1,56 @@
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from fastapi.testclient import TestClient
+
+from middleware import BodyLimitMiddleware, LastWriteMiddleware
+
+
+async def ok(request):
+    return PlainTextResponse("ok")
+
+async def rejected(request):
+    return PlainTextResponse("no", status_code=422)
+
+def make_client(**options) -> TestClient:
+    app = Starlette(routes=[
+        Route("/items", ok, methods=["GET", "POST"]),
+        Route("/login", ok, methods=["POST"]),
+        Route("/invalid", rejected, methods=["POST"]),
+    ])
+    app.add_middleware(LastWriteMiddleware, window=5, exempt=("/login",), **options)
+    return TestClient(app)
+
+
+def test_write_cookie_is_cross_site_even_behind_a_tls_proxy():
+    # TestClient speaks plain http, as uvicorn sees requests from a proxy it
+    # doesn't trust with X-Forwarded-Proto
+    cookie = make_client().post("/items").headers["set-cookie"]
+    assert cookie.startswith("last_write=")
+    assert "SameSite=None; Secure" in cookie
+
+def test_same_site_comes_from_config():
+    assert "SameSite=Lax" in make_client(same_site="lax").post("/items").headers["set-cookie"]
+
+def test_only_successful_data_writes_are_stamped():
+    client = make_client()
+    assert "set-cookie" not in client.get("/items").headers
+    assert "set-cookie" not in client.post("/login").headers
+    assert "set-cookie" not in client.post("/invalid").headers
+
+
+def test_body_limit_checks_content_length_before_the_endpoint():
+    received = []
+
+    async def upload(request):
+        received.append(len(await request.body()))
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/items/{id}/image", upload, methods=["POST"]), Route("/items", upload, methods=["POST"])])
+    app.add_middleware(BodyLimitMiddleware, limits=[("POST", r"/items/[^/]+/image", 100)])
+    client = TestClient(app)
+    assert client.post("/items/1/image", content=b"x" * 100).status_code == 200
+    assert client.post("/items/1/image", content=b"x" * 101).status_code == 413
+    assert client.post("/items/1/image", content=iter([b"x"])).status_code == 411
+    assert client.post("/items", content=b"x" * 1000).status_code == 200
+    assert received == [100, 1000]
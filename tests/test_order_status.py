@@ -0,0 +1,97 @@
+import asyncio
+import uuid
+
+from sqlalchemy import select
+
+import main
+from conftest import ADMIN, run_with_client
+from database import AsyncSessionLocal
+from models import OrderStatusTotal, Product, ProductSales
+
+
+async def drain_jobs():
+    for _ in range(200):
+        if not (await main.job_queue.stats())["depth"]:
+            return
+        await asyncio.sleep(0.05)
+    raise AssertionError("background jobs did not finish")
+
+async def place_orders(client, count: int, stock: int):
+    category = await client.post("/categories", json={"name": f"Race {uuid.uuid4().hex}"}, headers=ADMIN)
+    created = await client.post(
+        "/products", json={"title": "Race", "price": 10, "category_id": category.json()["id"], "stock": stock}, headers=ADMIN,
+    )
+    product_id = created.json()["id"]
+    order_ids = []
+    for i in range(count):
+        response = await client.post("/orders", json={"product_id": product_id, "quantity": 1, "user": f"u{i}", "status": "Pending"})
+        order_ids.append(response.json()["id"])
+    return product_id, order_ids
+
+async def patch_twice_at_once(client, order_ids, status: str):
+    responses = await asyncio.gather(*(
+        client.patch(f"/orders/{order_id}", json={"status": status}, headers=ADMIN)
+        for order_id in order_ids for _ in range(2)
+    ))
+    assert all(response.status_code == 200 for response in responses)
+    await drain_jobs()
+
+async def snapshot(product_id: int):
+    async with AsyncSessionLocal() as db:
+        stock = await db.scalar(select(Product.stock).where(Product.id == product_id))
+        totals = dict((await db.execute(select(OrderStatusTotal.status, OrderStatusTotal.orders))).all())
+        sales = await db.scalar(select(ProductSales.orders).where(ProductSales.product_id == product_id))
+    return stock, totals, sales
+
+
+def test_concurrent_status_changes_apply_once():
+    async def test(client):
+        product_id, order_ids = await place_orders(client, 40, stock=1000)
+        _, before, _ = await snapshot(product_id)
+
+        await patch_twice_at_once(client, order_ids[:20], "Cancelled")
+        stock, totals, sales = await snapshot(product_id)
+        assert stock == 980
+        assert totals.get("Cancelled", 0) - before.get("Cancelled", 0) == 20
+        assert sales == 20
+
+        # Reactivating must take the stock back exactly once too
+        await patch_twice_at_once(client, order_ids[:20], "Pending")
+        stock, totals, sales = await snapshot(product_id)
+        assert stock == 960
+        assert totals.get("Cancelled", 0) == before.get("Cancelled", 0)
+        assert sales == 40
+    run_with_client(test)
+
+
+def test_status_changes_need_admin_and_delete_releases_stock():
+    async def test(client):
+        product_id, order_ids = await place_orders(client, 3, stock=10)
+        body = {"order_ids": order_ids, "status": "Cancelled"}
+        assert (await client.patch("/orders/bulk", json=body)).status_code == 401
+        assert (await client.patch(f"/orders/{order_ids[0]}", json={"status": "Cancelled"})).status_code == 401
+        assert (await client.delete(f"/orders/{order_ids[0]}")).status_code == 401
+
+        # Pending order: its unit comes back with the delete
+        assert (await client.delete(f"/orders/{order_ids[0]}", headers=ADMIN)).status_code == 200
+        stock, _, _ = await snapshot(product_id)
+        assert stock == 8
+
+        # Cancelled order: released by the job, not again by the delete
+        await patch_twice_at_once(client, order_ids[1:2], "Cancelled")
+        assert (await client.delete(f"/orders/{order_ids[1]}", headers=ADMIN)).status_code == 200
+        stock, _, _ = await snapshot(product_id)
+        assert stock == 9
+    run_with_client(test)
+
+
+def test_orders_cannot_be_created_cancelled():
+    async def test(client):
+        product_id, _ = await place_orders(client, 0, stock=5)
+        order = {"product_id": product_id, "quantity": 2, "user": "u", "status": "Cancelled"}
+        assert (await client.post("/orders", json=order)).status_code == 422
+        batch = {"user": "u", "status": "Cancelled", "items": [{"product_id": product_id, "quantity": 2}]}
+        assert (await client.post("/orders/batch", json=batch)).status_code == 422
+        stock, _, _ = await snapshot(product_id)
+        assert stock == 5
+    run_with_client(test)
@@ -0,0 +1,68 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database import SessionLocal
+from models import Order
+from pagination import encode_cursor
+
+
+def raw_cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("path, cursor", [
+    ("/products?sort=price", raw_cursor("[[1],2]")),
+    ("/products?sort=price", raw_cursor("[NaN,2]")),
+    ("/products", raw_cursor('[{"a":1}]')),
+    ("/products", raw_cursor("[null]")),
+    ("/products", raw_cursor("[true]")),
+    ("/products", raw_cursor(json.dumps([2**70]))),
+    ("/orders", raw_cursor('["1"]')),
+    ("/products/search?q=lamp", raw_cursor("[-5]")),
+    ("/products/search?q=lamp", raw_cursor("[1.5]")),
+    ("/products", "not base64!"),
+])
+def test_malformed_cursors_are_rejected(client, path, cursor):
+    separator = "&" if "?" in path else "?"
+    response = client.get(f"{path}{separator}cursor={cursor}")
+    assert response.status_code == 400
+
+def test_valid_cursors_page(client):
+    assert client.get(f"/products?sort=price&cursor={encode_cursor(9.5, 3)}").status_code == 200
+    assert client.get(f"/orders?cursor={encode_cursor(10)}").status_code == 200
+    assert client.get(f"/products/search?q=lamp&cursor={encode_cursor(20)}").status_code == 200
+
+
+def test_date_range_pages_go_newest_first(client):
+    user = f"pager-{uuid.uuid4().hex}"
+    created = [datetime(2024, 1, day, 12) for day in (5, 20, 1, 12, 28, 9)]
+    with SessionLocal() as db:
+        db.add_all(Order(product_id=1, quantity=1, user=user, status="Pending", created_at=at) for at in created)
+        db.commit()
+    params = {"user": user, "created_from": "2024-01-02T00:00:00", "created_to": "2024-01-25T00:00:00", "limit": 2}
+    seen, cursor = [], None
+    while True:
+        response = client.get("/orders", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen += [datetime.fromisoformat(order["created_at"]) for order in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == sorted((at for at in created if datetime(2024, 1, 2) <= at < datetime(2024, 1, 25)), reverse=True)
+
+def test_date_range_cursor_needs_a_timestamp(client):
+    params = {"created_from": "2024-01-01T00:00:00", "cursor": encode_cursor(10)}
+    assert client.get("/orders", params=params).status_code == 400
+    params["cursor"] = encode_cursor("yesterday", 10)
+    assert client.get("/orders", params=params).status_code == 400
@@ -0,0 +1,45 @@
+import json
+import uuid
+
+from conftest import ADMIN, run_with_client
+
+async def create_product(client, **fields):
+    category = await client.post("/categories", json={"name": f"Products {uuid.uuid4().hex}"}, headers=ADMIN)
+    body = {"title": "Lamp", "price": 20, "category_id": category.json()["id"], **fields}
+    return (await client.post("/products", json=body, headers=ADMIN)).json()
+
+
+def test_full_writes_leave_stock_alone():
+    async def test(client):
+        product = await create_product(client, stock=5)
+        body = {key: product[key] for key in ("title", "price", "category_id")}
+
+        # A PUT from a client that doesn't know about stock keeps tracking on
+        response = await client.put(f"/products/{product['id']}", json={**body, "title": "Desk lamp"}, headers=ADMIN)
+        assert response.json()["stock"] == 5
+        response = await client.put(f"/products/{product['id']}", json={**body, "stock": 99}, headers=ADMIN)
+        assert response.json()["stock"] == 5
+
+        row = json.dumps({"id": product["id"], **body, "stock": 0})
+        assert (await client.post("/products/bulk", content=row, headers=ADMIN)).status_code == 200
+        assert (await client.get(f"/products/{product['id']}")).json()["stock"] == 5
+
+        response = await client.patch(f"/products/{product['id']}", json={"stock": 7}, headers=ADMIN)
+        assert response.json()["stock"] == 7
+    run_with_client(test)
+
+
+def test_import_updates_known_ids_and_reports_unknown_ones():
+    async def test(client):
+        product = await create_product(client)
+        body = {"price": 25, "category_id": product["category_id"]}
+        rows = "\n".join(json.dumps(row) for row in (
+            {"id": product["id"], "title": "Floor lamp", **body},
+            {"id": 10_000_000, "title": "Ghost", **body},
+            {"title": "Table lamp", **body},
+        ))
+        stats = (await client.post("/products/bulk", content=rows, headers=ADMIN)).json()
+        assert stats == {"rows": 3, "inserted": 1, "updated": 1, "not_found": [10_000_000]}
+        assert (await client.get(f"/products/{product['id']}")).json()["title"] == "Floor lamp"
+        assert (await client.get("/products/10000000")).status_code == 404
+    run_with_client(test)
@@ -0,0 +1,52 @@
+import itertools
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select, text
+
+import main
+from database import engine
+from models import Order, Product
+from pagination import encode_cursor
+
+
+def query_plan(query) -> str:
+    sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        return " / ".join(row[3] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+PRICE_RANGES = [(None, None), (5, None), (None, 50), (5, 50)]
+
+@pytest.mark.parametrize("category_id, offer_id, prices, sort, paged", list(itertools.product(
+    [None, 1], [None, 2], PRICE_RANGES, ["id", "price"], [False, True],
+)))
+def test_product_pages_walk_an_index_in_order(category_id, offer_id, prices, sort, paged):
+    cursor = None
+    if paged:
+        cursor = encode_cursor(10) if sort == "id" else encode_cursor(9.5, 10)
+    query = main.page_products(select(Product), category_id, offer_id, *prices, sort, cursor).limit(51)
+    plan = query_plan(query)
+    assert "TEMP B-TREE" not in plan
+    if sort == "price":
+        assert "_price_id" in plan
+    elif category_id is None and offer_id is None:
+        assert "products USING INTEGER PRIMARY KEY" in plan or plan == "SCAN products"
+    else:
+        assert "_id_id" in plan
+
+
+@pytest.mark.parametrize("user, status, product_id, dates, paged", list(itertools.product(
+    [None, "u1"], [None, "Pending"], [None, 3],
+    [(None, None), (datetime(2024, 1, 1), None), (None, datetime(2024, 2, 1)), (datetime(2024, 1, 1), datetime(2024, 2, 1))],
+    [False, True],
+)))
+def test_order_pages_walk_an_index_in_order(user, status, product_id, dates, paged):
+    cursor = None
+    if paged:
+        cursor = encode_cursor(100) if dates == (None, None) else encode_cursor("2024-01-15T00:00:00", 100)
+    query = main.page_orders(select(Order), user, status, product_id, *dates, cursor).limit(51)
+    plan = query_plan(query)
+    assert "TEMP B-TREE" not in plan
+    if dates != (None, None):
+        assert "created_at_id" in plan
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from ratelimit import MemoryStore, RateLimit
+from tokens import TokenUser
+
+
+@pytest.fixture(autouse=True)
+def enable_limits(monkeypatch):
+    # The other tests run with limits off (see conftest.py)
+    monkeypatch.setattr("ratelimit.RATE_LIMIT_ENABLED", True)
+
+
+def make_request(body: bytes = b"", user=None, ip: str = "10.0.0.1") -> Request:
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    scope = {
+        "type": "http", "method": "POST", "path": "/orders", "headers": [(b"content-type", b"application/json")],
+        "client": (ip, 1234), "query_string": b"",
+    }
+    request = Request(scope, receive)
+    if user is not None:
+        request.state.user = user
+    return request
+
+def allowed(limit: RateLimit, requests) -> int:
+    async def run():
+        passed = 0
+        for request in requests:
+            try:
+                await limit(request)
+                passed += 1
+            except Exception:
+                pass
+        return passed
+    return asyncio.run(run())
+
+
+def test_user_limit_ignores_names_in_the_body():
+    limit = RateLimit("orders", "3/minute", key="user", store=MemoryStore())
+    spoofed = [make_request(f'{{"user": "u{i}"}}'.encode()) for i in range(10)]
+    assert allowed(limit, spoofed) == 3
+
+def test_user_limit_keys_on_the_verified_user():
+    limit = RateLimit("orders", "3/minute", key="user", store=MemoryStore())
+    # Same address, different token holders: separate buckets
+    alice = [make_request(user=TokenUser("alice", "user")) for _ in range(5)]
+    bob = [make_request(user=TokenUser("bob", "user")) for _ in range(5)]
+    assert allowed(limit, alice) == 3
+    assert allowed(limit, bob) == 3
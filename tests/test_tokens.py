@@ -0,0 +1,88 @@
+import base64
+import json
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import ADMIN, run_with_client
+from tokens import decode_token, encode_token, issue_tokens
+
+
+def b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+def bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+def access_token(role: str = "user") -> str:
+    return issue_tokens("someone", role)["access_token"]
+
+def rejected(token: str, token_type: str = "access") -> bool:
+    with pytest.raises(HTTPException) as error:
+        decode_token(token, token_type)
+    return error.value.status_code == 401
+
+
+def test_valid_token_decodes():
+    claims = decode_token(access_token("admin"), "access")
+    assert (claims["sub"], claims["role"]) == ("someone", "admin")
+
+def test_tampered_signature_is_rejected():
+    header, payload, signature = access_token().split(".")
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    assert rejected(f"{header}.{payload}.{flipped}")
+    assert rejected(f"{header}.{payload}.")
+    assert rejected(f"{header}.{payload}")
+
+def test_changed_claims_are_rejected():
+    header, payload, signature = access_token().split(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    assert rejected(f"{header}.{b64({**claims, 'role': 'admin'})}.{signature}")
+
+@pytest.mark.parametrize("header", [
+    {"alg": "none", "typ": "JWT"},
+    {"alg": "HS512", "typ": "JWT"},
+    {"typ": "JWT", "alg": "HS256"},
+])
+def test_other_headers_are_rejected(header):
+    _, payload, signature = access_token().split(".")
+    assert rejected(f"{b64(header)}.{payload}.{signature}")
+    assert rejected(f"{b64(header)}.{payload}.")
+
+def test_expired_token_is_rejected():
+    now = int(time.time())
+    token = encode_token({"sub": "someone", "role": "admin", "type": "access", "iat": now - 120, "exp": now - 60})
+    assert rejected(token)
+
+def test_token_types_are_not_interchangeable():
+    tokens = issue_tokens("someone", "admin")
+    assert rejected(tokens["refresh_token"], "access")
+    assert rejected(tokens["access_token"], "refresh")
+
+@pytest.mark.parametrize("token", ["", "garbage", "a.b.c", "é.é.é"])
+def test_malformed_tokens_are_rejected(token):
+    assert rejected(token)
+
+
+def test_endpoints_check_tokens_and_roles():
+    async def test(client):
+        assert (await client.get("/jobs/stats")).status_code == 401
+        refresh = issue_tokens("admin@test", "admin")["refresh_token"]
+        assert (await client.get("/jobs/stats", headers=bearer(refresh))).status_code == 401
+        assert (await client.get("/jobs/stats", headers=bearer(access_token("user")))).status_code == 403
+        assert (await client.get("/jobs/stats", headers=ADMIN)).status_code == 200
+        response = await client.post("/token/refresh", json={"refresh_token": ADMIN["Authorization"].split()[1]})
+        assert response.status_code == 401
+    run_with_client(test)
+
+def test_only_admins_register_admins():
+    async def test(client):
+        body = {"username": f"admin-{uuid.uuid4().hex}", "password": "secret-pass", "role": "admin"}
+        assert (await client.post("/register", json=body)).status_code == 403
+        assert (await client.post("/register", json=body, headers=bearer(access_token("user")))).status_code == 403
+        response = await client.post("/register", json=body, headers=ADMIN)
+        assert response.status_code == 200
+        assert response.json()["role"] == "admin"
+    run_with_client(test)
@@ -0,0 +1,106 @@
+"""Stateless HS256 JWT access and refresh tokens.
+
+Access tokens carry the username and role, so ``current_user`` authorizes a
+request with one HMAC over the token: no users query, no bcrypt. Refresh
+tokens only carry the username; POST /token/refresh re-reads the user so
+role changes and deleted accounts take effect within ACCESS_TOKEN_TTL.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from config import SECRET_KEY, ACCESS_TOKEN_TTL, REFRESH_TOKEN_TTL
+
+logger = logging.getLogger(__name__)
+
+if SECRET_KEY:
+    _key = SECRET_KEY.encode()
+else:
+    logger.warning("SECRET_KEY is not set; tokens are signed with a per-process random key")
+    _key = secrets.token_bytes(32)
+
+_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+
+
+class TokenUser(NamedTuple):
+    username: str
+    role: str
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+def _sign(signing_input: bytes) -> bytes:
+    return _b64encode(hmac.new(_key, signing_input, hashlib.sha256).digest())
+
+def encode_token(claims: dict) -> str:
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = _HEADER + b"." + payload
+    return (signing_input + b"." + _sign(signing_input)).decode()
+
+def credentials_error(detail: str = "Invalid or expired token") -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+def decode_token(token: str, token_type: str) -> dict:
+    """Verify signature, expiry and type; raise 401 otherwise."""
+    try:
+        signing_input, _, signature = token.encode().rpartition(b".")
+        header, _, payload = signing_input.partition(b".")
+        # Only accept our own header, which rules out alg=none and friends
+        if header != _HEADER or not hmac.compare_digest(signature, _sign(signing_input)):
+            raise credentials_error()
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError):
+        raise credentials_error() from None
+    if claims.get("type") != token_type or claims.get("exp", 0) < time.time():
+        raise credentials_error()
+    return claims
+
+
+def issue_tokens(username: str, role: str) -> dict:
+    now = int(time.time())
+    access = encode_token({"sub": username, "role": role, "type": "access", "iat": now, "exp": now + ACCESS_TOKEN_TTL})
+    refresh = encode_token({"sub": username, "type": "refresh", "iat": now, "exp": now + REFRESH_TOKEN_TTL})
+    return {
+        "access_token": access,
+        "refresh_token": refresh,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL,
+    }
+
+
+# -------- DEPENDENCIES --------
+bearer = HTTPBearer(auto_error=False)
+
+async def optional_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer),
+) -> Optional[TokenUser]:
+    if credentials is None:
+        return None
+    claims = decode_token(credentials.credentials, "access")
+    user = TokenUser(claims["sub"], claims.get("role", "user"))
+    # Lets per-user rate limits key on the verified identity
+    request.state.user = user
+    return user
+
+async def current_user(user: Optional[TokenUser] = Depends(optional_user)) -> TokenUser:
+    if user is None:
+        raise credentials_error("Not authenticated")
+    return user
+
+async def require_admin(user: TokenUser = Depends(current_user)) -> TokenUser:
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return user
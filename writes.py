@@ -0,0 +1,53 @@
+"""Single-statement writes for the CRUD handlers.
+
+INSERT/UPDATE/DELETE ... RETURNING hand back the written row in the same
+round trip, so a handler needs neither a SELECT to load the row nor a
+refresh afterwards, and nothing goes through the identity map. Backends
+without RETURNING (SQLite before 3.35) fall back to the statement plus
+one SELECT.
+"""
+from sqlalchemy import delete, insert, select, update
+
+
+def columns(model):
+    return model.__table__.columns
+
+async def insert_row(db, model, values: dict):
+    """INSERT and return the new row as a mapping."""
+    stmt = insert(model).values(**values)
+    if db.bind.dialect.insert_returning:
+        return (await db.execute(stmt.returning(*columns(model)))).mappings().one()
+    result = await db.execute(stmt)
+    return (await db.execute(select(*columns(model)).where(model.id == result.inserted_primary_key[0]))).mappings().one()
+
+async def update_row(db, model, row_id: int, values: dict):
+    """UPDATE one row by id; returns the updated row, or None if there is none."""
+    stmt = update(model).where(model.id == row_id).values(**values).execution_options(synchronize_session=False)
+    if db.bind.dialect.update_returning:
+        return (await db.execute(stmt.returning(*columns(model)))).mappings().first()
+    if (await db.execute(stmt)).rowcount == 0:
+        return None
+    return (await db.execute(select(*columns(model)).where(model.id == row_id))).mappings().first()
+
+async def update_ids(db, model, ids: list, values: dict, *where) -> list:
+    """UPDATE the rows among ``ids`` that also match ``where``; returns the
+    ids it changed, so callers can act on exactly those."""
+    stmt = update(model).values(**values).execution_options(synchronize_session=False)
+    if db.bind.dialect.update_returning:
+        return (await db.scalars(stmt.where(model.id.in_(ids), *where).returning(model.id))).all()
+    # Without RETURNING, one statement per row tells which ones matched
+    return [row_id for row_id in ids if (await db.execute(stmt.where(model.id == row_id, *where))).rowcount == 1]
+
+async def delete_row(db, model, row_id: int, *where):
+    """DELETE one row by id (and any extra conditions); returns the deleted
+    row, or None if nothing matched."""
+    stmt = delete(model).where(model.id == row_id, *where).execution_options(synchronize_session=False)
+    if db.bind.dialect.delete_returning:
+        return (await db.execute(stmt.returning(*columns(model)))).mappings().first()
+    row = (await db.execute(select(*columns(model)).where(model.id == row_id, *where))).mappings().first()
+    if row is not None:
+        await db.execute(stmt)
+    return row
+
+async def exists(db, model, row_id: int) -> bool:
+    return await db.scalar(select(model.id).where(model.id == row_id)) is not None